@@ -1,89 +1,484 @@
 # python3 COOcov.py AT_coo.parquet A_coo.parquet cov_coo.parquet -n 2000 --chunk 1000000 --chunk_B 1000000
+# python3 COOcov.py AT_coo.parquet A_coo.parquet cov_dir -n 2000 --workers 32
+# python3 COOcov.py A_coo.parquet -o cov_coo.parquet -n 2000 --sym --mirror
+# python3 COOcov.py A_coo.parquet -o cov_coo.parquet -n 2000 --csr --accum dense
+# python3 COOcov.py A_coo.parquet -o corr_coo.parquet -n 2000 --csr --correlation --mirror
+# python3 COOcov.py A.csr -o cov_coo.parquet -n 2000 --csr                 (CSR store from csrMx.py)
 
+import numpy as np
 import polars as pl
+import pyarrow as pa
 import pyarrow.parquet as pq
 import os
 import argparse
 
-def matmul_coo_parquet_cov(A_path, B_path, C_path, N_rows, chunk_A=1_000_000, chunk_B=1_000_000):
+from accumCOO import COOAccumulator
+from stdCOO import coo_column_stats
+from COOmul import matmul_coo_parquet_parallel
+from parquetChunks import iter_parquet_chunks, parquet_chunk_plan, read_parquet_chunk, column_max
+from csrMx import is_csr_store, open_csr, iter_csr_blocks
+
+def matmul_coo_parquet_cov(A_path, B_path, C_path, N_rows, chunk_A=1_000_000, chunk_B=1_000_000,
+                           memory_budget=1 << 30, bin_rows=1_000_000, tmp_dir=None):
     """
     Compute C = tA x A / (N_rows-1) with both tA and A chunked.
     This is suitable for covariance / correlation computation.
-    Writes C to Parquet incrementally.
+    Partial products go to a spill-to-disk accumulator bounded by memory_budget.
     """
 
     # Remove old output
     if os.path.exists(C_path):
         os.remove(C_path)
 
-    # Metadata
-    meta_A = pq.read_metadata(A_path)
-    maxA = meta_A.num_rows
-    meta_B = pq.read_metadata(B_path)
-    maxB = meta_B.num_rows
-    print(f"A: {maxA} nonzero rows, B: {maxB} nonzero rows")
-
-    first_chunk = True
-    offset_A = 0
-
-    while offset_A < maxA:
-        print(f"Processing A chunk: {offset_A} -> {min(offset_A+chunk_A, maxA)}")
-        A_chunk = (
-            pl.scan_parquet(A_path)
-            .slice(offset_A, chunk_A)
-            .select(["row", "col", "val"])
-            .collect()
+    with COOAccumulator(memory_budget, bin_rows, tmp_dir or os.path.dirname(os.path.abspath(C_path))) as acc:
+        # Metadata
+        meta_A = pq.read_metadata(A_path)
+        maxA = meta_A.num_rows
+        meta_B = pq.read_metadata(B_path)
+        maxB = meta_B.num_rows
+        print(f"A: {maxA} nonzero rows, B: {maxB} nonzero rows")
+
+        for offset_A, A_chunk in iter_parquet_chunks(A_path, chunk_A, columns=["row", "col", "val"]):
+            print(f"Processing A chunk: {offset_A} -> {offset_A+A_chunk.height}")
+
+            for offset_B, B_chunk in iter_parquet_chunks(B_path, chunk_B, columns=["row", "col", "val"]):
+                print(f"  Processing B chunk: {offset_B} -> {offset_B+B_chunk.height}")
+
+                # Multiply and scale by N_rows for covariance
+                joined = (
+                    A_chunk.join(B_chunk, left_on="col", right_on="row", how="inner")
+                    .with_columns((pl.col("val") * pl.col("val_right")).alias("mul"))
+                    .group_by(["row", "col_right"])
+                    .agg((pl.sum("mul")/(N_rows-1)).alias("val"))
+                    .rename({"col_right": "col"})
+                )
+
+                acc.add(joined)
+
+        nnz = acc.write_parquet(C_path)
+    print(f"Done. Wrote C: {C_path} ({nnz} nonzero entries)")
+
+
+def gram_coo_parquet_sym(A_path, C_path, N_rows, chunk=1_000_000, mirror=False,
+                         memory_budget=1 << 30, bin_rows=1_000_000, tmp_dir=None):
+    """
+    Compute C = tA x A / (N_rows-1) from A alone, without a transposed copy.
+    A is self-joined on row, so tA is only virtual. Only chunk pairs (a, b)
+    with b >= a are joined and only the upper triangle (row <= col) is
+    accumulated. With mirror=True the strictly lower half is added on output.
+    Duplicate (row, col) entries of A are summed, also across chunks.
+    """
+
+    # Remove old output
+    if os.path.exists(C_path):
+        os.remove(C_path)
+
+    work_dir = tmp_dir or os.path.dirname(os.path.abspath(C_path))
+    with COOAccumulator(memory_budget, bin_rows, work_dir) as acc:
+        maxA = pq.read_metadata(A_path).num_rows
+        print(f"A: {maxA} nonzero rows (symmetric mode)")
+
+        # Row-group-aligned chunks, so chunk b can be read directly for every b >= a
+        plan = parquet_chunk_plan(A_path, chunk)
+
+        for a, (offset_A, n_A, groups_A) in enumerate(plan):
+            print(f"Processing A chunk: {offset_A} -> {offset_A+n_A}")
+            A_chunk = read_parquet_chunk(A_path, groups_A, columns=["row", "col", "val"])
+
+            for b in range(a, len(plan)):
+                offset_B, n_B, groups_B = plan[b]
+                print(f"  Processing B chunk: {offset_B} -> {offset_B+n_B}")
+                if b == a:
+                    B_chunk = A_chunk
+                else:
+                    B_chunk = read_parquet_chunk(A_path, groups_B, columns=["row", "col", "val"])
+
+                pairs = A_chunk.join(B_chunk, on="row", how="inner")
+
+                if b == a:
+                    # Same chunk: every unordered pair is seen in both orders
+                    pairs = pairs.filter(pl.col("col") <= pl.col("col_right"))
+                    i_expr, j_expr = pl.col("col"), pl.col("col_right")
+                    mul_expr = pl.col("val") * pl.col("val_right")
+                else:
+                    # Different chunks: each pair is seen once, fold into the upper half.
+                    # A duplicated (row, col) split across chunks meets itself here once,
+                    # but its cross term 2*v1*v2 belongs twice on the diagonal
+                    i_expr = pl.min_horizontal("col", "col_right")
+                    j_expr = pl.max_horizontal("col", "col_right")
+                    mul_expr = (pl.when(pl.col("col") == pl.col("col_right")).then(2.0).otherwise(1.0)
+                                * pl.col("val") * pl.col("val_right"))
+
+                joined = (
+                    pairs.select([
+                        i_expr.alias("i"),
+                        j_expr.alias("j"),
+                        mul_expr.alias("mul"),
+                    ])
+                    .group_by(["i", "j"])
+                    .agg((pl.sum("mul")/(N_rows-1)).alias("val"))
+                    .rename({"i": "row", "j": "col"})
+                )
+
+                acc.add(joined)
+
+        nnz = write_accumulated(acc, C_path, work_dir, mirror)
+    print(f"Done. Wrote {'C' if mirror else 'upper triangle of C'}: {C_path} ({nnz} nonzero entries)")
+
+
+def write_accumulated(acc, C_path, work_dir, mirror=False):
+    """
+    Write an accumulated upper triangle to C_path, or the full symmetric
+    matrix with mirror=True (via a temporary upper-triangle file).
+    Returns the number of entries written.
+    """
+    if not mirror:
+        return acc.write_parquet(C_path)
+    upper_path = os.path.join(work_dir, os.path.basename(C_path) + ".upper.tmp")
+    try:
+        acc.write_parquet(upper_path)
+        return mirror_coo_parquet(upper_path, C_path)
+    finally:
+        if os.path.exists(upper_path):
+            os.remove(upper_path)
+
+
+def mirror_coo_parquet(upper_path, out_path):
+    """
+    Expand an upper-triangle COO Parquet file into the full symmetric matrix,
+    one row group at a time. Returns the number of entries written.
+    """
+    pf = pq.ParquetFile(upper_path)
+    writer = pq.ParquetWriter(out_path, pf.schema_arrow)
+    total = 0
+
+    for i in range(pf.num_row_groups):
+        upper = pl.from_arrow(pf.read_row_group(i))
+        lower = (
+            upper.filter(pl.col("row") < pl.col("col"))
+            .select([pl.col("col").alias("row"), pl.col("row").alias("col"), pl.col("val")])
         )
 
-        if A_chunk.height == 0:
-            break
+        table = pl.concat([upper, lower]).to_arrow()
+        writer.write_table(table)
+        total += table.num_rows
 
-        partial_results = None
-        offset_B = 0
+    writer.close()
 
-        while offset_B < maxB:
-            print(f"  Processing B chunk: {offset_B} -> {min(offset_B+chunk_B, maxB)}")
-            B_chunk = (
-                pl.scan_parquet(B_path)
-                .slice(offset_B, chunk_B)
-                .select(["row", "col", "val"])
-                .collect()
-            )
+    return total
 
-            if B_chunk.height == 0:
-                break
 
-            # Multiply and scale by N_rows for covariance
-            joined = (
-                A_chunk.join(B_chunk, left_on="col", right_on="row", how="inner")
-                .with_columns((pl.col("val") * pl.col("val_right")).alias("mul"))
-                .group_by(["row", "col_right"])
-                .agg((pl.sum("mul")/(N_rows-1)).alias("val"))
-                .rename({"col_right": "col"})
-            )
-
-            if partial_results is None:
-                partial_results = joined
-            else:
-                partial_results = (
-                    partial_results.vstack(joined)
+def coo_chunk_to_csr(rows, cols, vals):
+    """
+    Group a row-sorted COO chunk into CSR arrays.
+    Returns (row_ids, indptr, indices, data) where row_ids[r] is the matrix
+    row stored in indptr[r]:indptr[r+1].
+    """
+    starts = np.flatnonzero(np.diff(rows)) + 1
+    indptr = np.concatenate(([0], starts, [len(rows)])).astype(np.int64)
+    row_ids = rows[indptr[:-1]]
+    return row_ids, indptr, cols, vals
+
+
+def csr_upper_pairs(indptr, indices, data):
+    """
+    Expand every row of a CSR block into its outer-product entries (i, j, v)
+    with i <= j, vectorized over the whole block.
+    """
+    lengths = np.diff(indptr)
+    entry_len = np.repeat(lengths, lengths)            # row length of each entry
+    entry_start = np.repeat(indptr[:-1], lengths)      # row start of each entry
+
+    left = np.repeat(np.arange(len(indices)), entry_len)
+    offsets = np.arange(len(left)) - np.repeat(np.cumsum(entry_len) - entry_len, entry_len)
+    right = np.repeat(entry_start, entry_len) + offsets
+
+    i = indices[left]
+    j = indices[right]
+    keep = i <= j
+    return i[keep], j[keep], data[left[keep]].astype(np.float64) * data[right[keep]]
+
+
+def iter_row_sorted_csr(A_path, chunk, n_entries):
+    """
+    Yield (indptr, indices, data) CSR blocks of a row-sorted COO Parquet file,
+    read chunk by chunk. A row split across two chunks is carried into the
+    next one.
+    """
+    carry = None
+    last_row = -1
+
+    for offset, A_chunk in iter_parquet_chunks(A_path, chunk, columns=["row", "col", "val"]):
+        print(f"Processing A chunk: {offset} -> {offset+A_chunk.height}")
+        final = offset + A_chunk.height >= n_entries
+        if carry is not None:
+            A_chunk = pl.concat([carry, A_chunk])
+            carry = None
+
+        rows = A_chunk["row"].to_numpy()
+        if rows.size == 0:
+            continue
+        if rows[0] < last_row or np.any(np.diff(rows) < 0):
+            raise ValueError(f"{A_path} is not sorted by row; sort it first with sortCOO.py sort --by row")
+
+        # Hold back the last (possibly incomplete) row for the next chunk
+        if not final:
+            cut = int(np.searchsorted(rows, rows[-1]))
+            carry = A_chunk.slice(cut)
+            A_chunk = A_chunk.slice(0, cut)
+            rows = rows[:cut]
+            if rows.size == 0:
+                continue
+        last_row = int(rows[-1])
+
+        _, indptr, indices, data = coo_chunk_to_csr(
+            rows, A_chunk["col"].to_numpy(), A_chunk["val"].to_numpy()
+        )
+        yield indptr, indices, data
+
+
+def cov_coo_parquet_csr(A_path, C_path, N_rows, n_cols=None, chunk=1_000_000, accum="dense",
+                        block_rows=4096, mirror=False, memory_budget=1 << 30, bin_rows=1_000_000, tmp_dir=None,
+                        col_sum=None, correlation=False):
+    """
+    Compute C = tA x A / (N_rows-1) with a row-wise outer-product kernel.
+    A is either a CSR store (csrMx.py), read block by block straight from its
+    memory-mapped arrays, or a row-sorted COO Parquet file grouped into CSR
+    blocks on the fly. accum="dense" densifies blocks of block_rows rows and adds
+    X^T X into an n_cols x n_cols array (BLAS); accum="sparse" expands each row
+    into its i <= j outer-product entries and sums them in a COOAccumulator.
+    Writes the upper triangle (row <= col), or the full matrix with mirror=True.
+    With col_sum (column sums of A) the dense Gram array is centred (and
+    rescaled to a correlation if requested) before it is written.
+    """
+
+    # Remove old output
+    if os.path.exists(C_path):
+        os.remove(C_path)
+
+    if is_csr_store(A_path):
+        meta, _, _, _ = open_csr(A_path)
+        if meta["format"] != "csr":
+            raise ValueError(f"{A_path} is a {meta['format'].upper()} store; the kernel needs CSR (csrMx.py to_csr)")
+        maxA = meta["nnz"]
+        n_cols = n_cols or meta["shape"][1]
+        # about `chunk` entries per block
+        rows_per_block = max(1, int(chunk * meta["shape"][0] / max(maxA, 1)))
+        blocks = ((indptr, indices, data) for _, indptr, indices, data in iter_csr_blocks(A_path, rows_per_block))
+    else:
+        meta = pq.read_metadata(A_path)
+        maxA = meta.num_rows
+        if n_cols is None:
+            n_cols = column_max(A_path, "col") + 1
+        blocks = iter_row_sorted_csr(A_path, chunk, maxA)
+    print(f"A: {maxA} nonzero rows, {n_cols} columns (CSR kernel, {accum} accumulator)")
+
+    if accum != "dense":
+        work_dir = tmp_dir or os.path.dirname(os.path.abspath(C_path))
+        with COOAccumulator(memory_budget, bin_rows, work_dir) as acc:
+            for indptr, indices, data in blocks:
+                i, j, v = csr_upper_pairs(indptr, np.asarray(indices), np.asarray(data))
+                acc.add(
+                    pl.DataFrame({"row": i, "col": j, "val": v / (N_rows-1)})
                     .group_by(["row", "col"])
-                    .agg(pl.sum("val").alias("val"))
+                    .agg(pl.sum("val"))
                 )
+            nnz = write_accumulated(acc, C_path, work_dir, mirror)
+        print(f"Done. Wrote C: {C_path} ({nnz} nonzero entries)")
+        return
 
-            offset_B += chunk_B
+    G = np.zeros((n_cols, n_cols), dtype=np.float64)
+    for indptr, indices, data in blocks:
+        n_block = len(indptr) - 1
+        for b in range(0, n_block, block_rows):
+            lo, hi = indptr[b], indptr[min(b + block_rows, n_block)]
+            X = np.zeros((min(block_rows, n_block - b), n_cols), dtype=np.float64)
+            local = np.repeat(np.arange(X.shape[0]), np.diff(indptr[b:b + X.shape[0] + 1]))
+            # duplicate (row, col) entries add up, as in COOmul and the sparse path
+            np.add.at(X, (local, indices[lo:hi]), data[lo:hi])
+            G += X.T @ X
 
-        # Write partial results to Parquet
-        table = partial_results.to_arrow()
-        if first_chunk:
-            pq.write_table(table, C_path)
-            first_chunk = False
-        else:
-            pq.write_table(table, C_path, append=True)
+    G /= (N_rows - 1)
+    if col_sum is not None:
+        center_gram_block(G, 0, col_sum, np.diag(G).copy(), N_rows, correlation)
+    if not mirror:
+        G = np.triu(G)
+    r, c = np.nonzero(G)
+    table = pa.table({
+        "row": pa.array(r.astype(np.int32)),
+        "col": pa.array(c.astype(np.int32)),
+        "val": pa.array(G[r, c]),
+    })
+    pq.write_table(table, C_path)
+    print(f"Done. Wrote C: {C_path} ({table.num_rows} nonzero entries)")
 
-        offset_A += chunk_A
 
-    print(f"Done. Wrote C: {C_path}")
+def dense_column_sums(A_path, N_rows, n_cols=None):
+    """
+    Column sums of A as a dense float64 array, from the same per-column
+    aggregation stdCOO/check_std_coo use (or from the data array of a CSR
+    store). Sums are not affected by duplicate (row, col) entries.
+    """
+    if is_csr_store(A_path):
+        meta, _, indices, data = open_csr(A_path)
+        n_cols = n_cols or meta["shape"][1]
+        col_sum = np.zeros(n_cols, dtype=np.float64)
+        for lo in range(0, meta["nnz"], 1 << 24):
+            col_sum += np.bincount(indices[lo:lo + (1 << 24)], weights=data[lo:lo + (1 << 24)].astype(np.float64),
+                                   minlength=n_cols)
+        return col_sum
+
+    stats = coo_column_stats(A_path, N_rows)
+    cols = stats["col"].to_numpy()
+    if n_cols is None:
+        n_cols = int(cols.max()) + 1
+    col_sum = np.zeros(n_cols, dtype=np.float64)
+    col_sum[cols] = stats["sum_nz"].to_numpy()
+    return col_sum
+
+
+def center_gram_block(D, r0, col_sum, gram_diag, N_rows, correlation=False):
+    """
+    Turn rows r0:r0+len(D) of tA x A / (N_rows-1) into covariance rows in
+    place: D -= n * mu_i * mu_j / (n-1). With correlation=True also divide by
+    std_i * std_j; columns with zero variance become 0. The variances are the
+    centred diagonal, gram_diag - n * mu^2 / (n-1), with gram_diag the
+    diagonal of tA x A / (N_rows-1), so duplicate entries of A, summed by
+    every Gram path, are accounted for.
+    """
+    mean = col_sum / N_rows
+    r1 = r0 + D.shape[0]
+    D -= (N_rows / (N_rows - 1)) * np.outer(mean[r0:r1], mean)
+
+    if correlation:
+        var = gram_diag - (N_rows / (N_rows - 1)) * mean**2
+        std = np.sqrt(np.clip(var, 0.0, None))
+        scale = np.outer(std[r0:r1], std)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            np.divide(D, scale, out=D, where=scale > 0)
+        D[scale == 0] = 0.0
+
+
+def gram_diagonal(raw_path, n_cols, chunk_size=1_000_000):
+    """Diagonal of a Gram COO file as a dense array, in one streaming pass."""
+    diag = np.zeros(n_cols, dtype=np.float64)
+    for _, chunk in iter_parquet_chunks(raw_path, chunk_size, columns=["row", "col", "val"]):
+        chunk = chunk.filter(pl.col("row") == pl.col("col"))
+        np.add.at(diag, chunk["row"].to_numpy(), chunk["val"].to_numpy())
+    return diag
+
+
+def iter_sorted_row_blocks(path, n_rows, block_rows, chunk_size=1_000_000):
+    """
+    Yield (r0, r1, rows, cols, vals) for every block of block_rows rows of a
+    row-sorted COO Parquet file (empty blocks included), in one sequential
+    pass over its row groups.
+    """
+    chunks = iter_parquet_chunks(path, chunk_size, columns=["row", "col", "val"])
+    rows, cols, vals = np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0)
+    exhausted = False
+
+    for r0 in range(0, n_rows, block_rows):
+        r1 = min(r0 + block_rows, n_rows)
+        # read until the buffer reaches past this block
+        while not exhausted and (len(rows) == 0 or rows[-1] < r1):
+            nxt = next(chunks, None)
+            if nxt is None:
+                exhausted = True
+                break
+            chunk = nxt[1]
+            r = chunk["row"].to_numpy().astype(np.int64)
+            if len(r) and (np.any(r[1:] < r[:-1]) or (len(rows) and r[0] < rows[-1])):
+                raise ValueError(f"{path} is not sorted by row")
+            rows = np.concatenate((rows, r))
+            cols = np.concatenate((cols, chunk["col"].to_numpy().astype(np.int64)))
+            vals = np.concatenate((vals, chunk["val"].to_numpy()))
+
+        k = np.searchsorted(rows, r1)
+        yield r0, r1, rows[:k], cols[:k], vals[:k]
+        rows, cols, vals = rows[k:], cols[k:], vals[k:]
+
+
+def center_gram_parquet(raw_path, out_path, N_rows, col_sum, upper=True, mirror=False,
+                        correlation=False, block_rows=1024):
+    """
+    Centre a sparse tA x A / (N_rows-1) COO file into a covariance (or
+    correlation) COO file, block_rows output rows at a time.
+    raw_path must be sorted by row (as COOAccumulator writes it) and is read
+    once. upper: raw_path holds only row <= col; mirror: write both halves.
+    The lower half of a block is taken from the same pass: strictly-upper
+    entries are held, transposed, until their output block comes up.
+    The centred matrix is dense over columns with nonzero mean.
+    A correlation needs every column's std before the first block, so its
+    Gram diagonal is read in a first pass.
+    """
+    n_cols = len(col_sum)
+    gram_diag = gram_diagonal(raw_path, n_cols) if correlation else None
+    schema = pa.schema([("row", pa.int32()), ("col", pa.int32()), ("val", pa.float64())])
+    writer = pq.ParquetWriter(out_path, schema)
+    total = 0
+    pending = {}  # output block -> [(rows, cols, vals)] of mirrored lower-half entries
+
+    for r0, r1, rows, cols, vals in iter_sorted_row_blocks(raw_path, n_cols, block_rows):
+        D = np.zeros((r1 - r0, n_cols), dtype=np.float64)
+        D[rows - r0, cols] = vals
+
+        if upper and mirror:
+            # Lower-half entries are stored transposed, in this or earlier row blocks
+            low = rows < cols
+            t_rows, t_cols, t_vals = cols[low], rows[low], vals[low]
+            order = np.argsort(t_rows, kind="stable")
+            t_rows, t_cols, t_vals = t_rows[order], t_cols[order], t_vals[order]
+            blocks = t_rows // block_rows
+            cuts = np.flatnonzero(np.diff(blocks)) + 1
+            for lo, hi in zip(np.concatenate(([0], cuts)), np.concatenate((cuts, [len(blocks)]))):
+                if hi > lo:
+                    pending.setdefault(int(blocks[lo]), []).append((t_rows[lo:hi], t_cols[lo:hi], t_vals[lo:hi]))
+            for lr, lc, lv in pending.pop(r0 // block_rows, []):
+                D[lr - r0, lc] = lv
+
+        center_gram_block(D, r0, col_sum, gram_diag, N_rows, correlation)
+
+        if upper and not mirror:
+            D[np.arange(n_cols)[None, :] < np.arange(r0, r1)[:, None]] = 0.0
+
+        r, c = np.nonzero(D)
+        table = pa.table({
+            "row": pa.array((r + r0).astype(np.int32)),
+            "col": pa.array(c.astype(np.int32)),
+            "val": pa.array(D[r, c]),
+        }, schema=schema)
+        writer.write_table(table)
+        total += table.num_rows
+
+    writer.close()
+
+    return total
+
+
+def cov_coo_parquet_centered(stats_path, C_path, N_rows, run_raw, upper=True, mirror=False,
+                             correlation=False, tmp_dir=None):
+    """
+    Covariance / correlation without a standardized copy of A: run_raw(path)
+    writes tA x A / (N_rows-1) from the raw COO input (upper triangle if
+    upper=True), then it is centred with column sums of stats_path.
+    """
+    col_sum = dense_column_sums(stats_path, N_rows)
+
+    work_dir = tmp_dir or os.path.dirname(os.path.abspath(C_path))
+    raw_path = os.path.join(work_dir, os.path.basename(C_path) + ".raw.tmp")
+    try:
+        run_raw(raw_path)
+        print(f"Centering{' and scaling to correlation' if correlation else ''}: {C_path}")
+        if os.path.exists(C_path):
+            os.remove(C_path)
+        nnz = center_gram_parquet(raw_path, C_path, N_rows, col_sum,
+                                  upper=upper, mirror=mirror, correlation=correlation)
+    finally:
+        if os.path.exists(raw_path):
+            os.remove(raw_path)
+
+    print(f"Done. Wrote C: {C_path} ({nnz} nonzero entries)")
 
 
 # ----------------------------
@@ -91,12 +486,79 @@ def matmul_coo_parquet_cov(A_path, B_path, C_path, N_rows, chunk_A=1_000_000, ch
 # ----------------------------
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
-    ap.add_argument("A", help="COO Parquet A")
-    ap.add_argument("B", help="COO Parquet B transposed")
-    ap.add_argument("C", help="Output COO Parquet C")
+    ap.add_argument("A", help="COO Parquet A (tA unless --sym)")
+    ap.add_argument("B", nargs="?", help="COO Parquet B transposed (not used with --sym/--csr)")
+    ap.add_argument("C", nargs="?", help="Output COO Parquet C (or -o)")
+    ap.add_argument("-o", "--output", default=None, help="Output COO Parquet C")
     ap.add_argument("-n", type=int, required=True, help="Total number of rows for scaling")
+    ap.add_argument("--sym", action="store_true",
+                    help="Symmetric mode: read A only, compute the row <= col half of tA x A")
+    ap.add_argument("--csr", action="store_true",
+                    help="CSR outer-product kernel: read row-sorted A or a CSR store once (two paths, like --sym)")
+    ap.add_argument("--accum", choices=["dense", "sparse"], default="dense", help="Accumulator for --csr")
+    ap.add_argument("--ncols", type=int, default=None, help="Number of columns of A for --csr (default: from metadata)")
+    ap.add_argument("--block_rows", type=int, default=4096, help="Rows per dense block for --csr --accum dense")
+    ap.add_argument("--mirror", action="store_true", help="With --sym or --csr, also write the lower half")
+    ap.add_argument("--center", action="store_true",
+                    help="Centre raw (unstandardized) A: (tA x A - n mu mu^T)/(n-1)")
+    ap.add_argument("--correlation", action="store_true", help="Centre and rescale by column std (implies --center)")
     ap.add_argument("--chunk", type=int, default=1_000_000, help="Rows per chunk for A")
     ap.add_argument("--chunk_B", type=int, default=1_000_000, help="Rows per chunk for B")
+    ap.add_argument("--mem_mb", type=int, default=1024, help="Memory budget for partial products before spilling (MB)")
+    ap.add_argument("--bin_rows", type=int, default=1_000_000, help="Output rows per accumulator bin")
+    ap.add_argument("--tmp_dir", default=None, help="Directory for spill runs (default: next to C)")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="Processes for the tA x A join; >1 writes C as a directory of part files")
+    ap.add_argument("--parts", type=int, default=64, help="Buckets (and output parts) for --workers")
     args = ap.parse_args()
 
-    matmul_coo_parquet_cov(args.A, args.B, args.C, N_rows=args.n, chunk_A=args.chunk, chunk_B=args.chunk_B)
+    extra = [p for p in (args.B, args.C) if p is not None]
+    if args.sym or args.csr:
+        # A and the output; a second positional path is still read as the output
+        if len(extra) + (args.output is not None) != 1:
+            ap.error("--sym/--csr take A and one output: A_coo.parquet -o C_coo.parquet")
+        C_path = args.output or extra[0]
+    else:
+        if args.B is None or (args.C is None) == (args.output is None):
+            ap.error("give A, B and one output (C or -o)")
+        C_path = args.output or args.C
+
+    memory_budget = args.mem_mb * 1024 * 1024
+    center = args.center or args.correlation
+    if args.workers > 1 and (args.sym or args.csr or center):
+        ap.error("--workers applies to the plain tA x A join only (not --sym/--csr/--center)")
+    if is_csr_store(args.A) and not (args.csr and (args.accum == "dense" or not center)):
+        ap.error("a CSR store as A needs --csr (and --accum dense with --center/--correlation)")
+
+    if args.csr:
+        def run(out, mirror, col_sum=None):
+            cov_coo_parquet_csr(args.A, out, N_rows=args.n, n_cols=args.ncols, chunk=args.chunk,
+                                accum=args.accum, block_rows=args.block_rows, mirror=mirror,
+                                memory_budget=memory_budget, bin_rows=args.bin_rows, tmp_dir=args.tmp_dir,
+                                col_sum=col_sum, correlation=args.correlation)
+    elif args.sym:
+        def run(out, mirror):
+            gram_coo_parquet_sym(args.A, out, N_rows=args.n, chunk=args.chunk, mirror=mirror,
+                                 memory_budget=memory_budget, bin_rows=args.bin_rows, tmp_dir=args.tmp_dir)
+    elif args.workers > 1:
+        def run(out, mirror):
+            matmul_coo_parquet_parallel(args.A, args.B, out, workers=args.workers, n_parts=args.parts,
+                                        chunk_size=args.chunk, chunk_B=args.chunk_B, scale=1.0 / (args.n - 1),
+                                        memory_budget=memory_budget, bin_rows=args.bin_rows, tmp_dir=args.tmp_dir)
+    else:
+        def run(out, mirror):
+            matmul_coo_parquet_cov(args.A, args.B, out, N_rows=args.n, chunk_A=args.chunk, chunk_B=args.chunk_B,
+                                   memory_budget=memory_budget, bin_rows=args.bin_rows, tmp_dir=args.tmp_dir)
+
+    if center and args.csr and args.accum == "dense":
+        # The dense Gram array is centred in memory
+        run(C_path, args.mirror, col_sum=dense_column_sums(args.A, args.n, args.ncols))
+    elif center:
+        # Column sums come from A (the second input in the tA x A form)
+        upper = args.sym or args.csr
+        stats_path = args.A if upper else args.B
+        cov_coo_parquet_centered(stats_path, C_path, args.n, lambda out: run(out, False),
+                                 upper=upper, mirror=args.mirror or not upper,
+                                 correlation=args.correlation, tmp_dir=args.tmp_dir)
+    else:
+        run(C_path, args.mirror)
@@ -1,93 +1,249 @@
 # python3 COOmul.py A_coo.parquet B_coo.parquet C_coo.parquet --chunk 5000000 --chunk_B 1000000
+# python3 COOmul.py A_coo.parquet B_coo.parquet C_coo.parquet --mode partitioned --parts 64
+# python3 COOmul.py A_coo.parquet B_coo.parquet C_dir --workers 32 --parts 128
 
 import polars as pl
 import pyarrow.parquet as pq
 import os
+import shutil
+import tempfile
 import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
-def matmul_coo_parquet_full_chunked(A_path, B_path, C_path, chunk_A=5_000_000, chunk_B=1_000_000):
+from accumCOO import COOAccumulator
+from parquetChunks import iter_parquet_chunks, write_dataset_manifest
+
+def matmul_coo_parquet_full_chunked(A_path, B_path, C_path, chunk_A=5_000_000, chunk_B=1_000_000,
+                                    memory_budget=1 << 30, bin_rows=1_000_000, tmp_dir=None):
     """
     Compute C = A x B with both A and B chunked to limit memory usage.
-    Writes C to Parquet incrementally.
+    Partial products go to a spill-to-disk accumulator bounded by memory_budget;
+    C is written once at the end with each (row, col) summed.
     """
 
     # Remove old output
     if os.path.exists(C_path):
         os.remove(C_path)
 
-    # Number of rows in A
-    meta_A = pq.read_metadata(A_path)
-    maxA = meta_A.num_rows
-    print(f"A has {maxA} nonzero entries (COO rows)")
-
-    # Number of rows in B
-    meta_B = pq.read_metadata(B_path)
-    maxB = meta_B.num_rows
-    print(f"B has {maxB} nonzero entries (COO rows)")
-
-    first_chunk = True
-
-    offset_A = 0
-    while offset_A < maxA:
-        print(f"Processing A chunk: rows {offset_A} -> {min(offset_A+chunk_A, maxA)}")
-        A_chunk = (
-            pl.scan_parquet(A_path)
-            .slice(offset_A, chunk_A)
-            .select(["row", "col", "val"])
-            .collect()
-        )
+    with COOAccumulator(memory_budget, bin_rows, tmp_dir or os.path.dirname(os.path.abspath(C_path))) as acc:
+        # Number of rows in A
+        meta_A = pq.read_metadata(A_path)
+        maxA = meta_A.num_rows
+        print(f"A has {maxA} nonzero entries (COO rows)")
+
+        # Number of rows in B
+        meta_B = pq.read_metadata(B_path)
+        maxB = meta_B.num_rows
+        print(f"B has {maxB} nonzero entries (COO rows)")
+
+        for offset_A, A_chunk in iter_parquet_chunks(A_path, chunk_A, columns=["row", "col", "val"]):
+            print(f"Processing A chunk: rows {offset_A} -> {offset_A+A_chunk.height}")
 
-        if A_chunk.height == 0:
-            break
-
-        # Initialize an empty Polars DataFrame to accumulate partial results
-        partial_results = None
-
-        offset_B = 0
-        while offset_B < maxB:
-            print(f"  Processing B chunk: rows {offset_B} -> {min(offset_B+chunk_B, maxB)}")
-            B_chunk = (
-                pl.scan_parquet(B_path)
-                .slice(offset_B, chunk_B)
-                .select(["row", "col", "val"])
-                .collect()
-            )
-
-            if B_chunk.height == 0:
-                break
-
-            # Multiply COO chunks
-            joined = (
-                A_chunk.join(B_chunk, left_on="col", right_on="row", how="inner")
-                .with_columns((pl.col("val") * pl.col("val_right")).alias("mul"))
-                .group_by(["row", "col_right"])
-                .agg(pl.sum("mul").alias("val"))
-                .rename({"col_right": "col"})
-            )
-
-            if partial_results is None:
-                partial_results = joined
-            else:
-                # accumulate sums
-                partial_results = (
-                    partial_results.vstack(joined)
-                    .group_by(["row", "col"])
-                    .agg(pl.sum("val").alias("val"))
+            for offset_B, B_chunk in iter_parquet_chunks(B_path, chunk_B, columns=["row", "col", "val"]):
+                print(f"  Processing B chunk: rows {offset_B} -> {offset_B+B_chunk.height}")
+
+                # Multiply COO chunks
+                joined = (
+                    A_chunk.join(B_chunk, left_on="col", right_on="row", how="inner")
+                    .with_columns((pl.col("val") * pl.col("val_right")).alias("mul"))
+                    .group_by(["row", "col_right"])
+                    .agg(pl.sum("mul").alias("val"))
+                    .rename({"col_right": "col"})
                 )
 
-            offset_B += chunk_B
+                acc.add(joined)
+
+        nnz = acc.write_parquet(C_path)
+    print(f"Done. Wrote C: {C_path} ({nnz} nonzero entries)")
+
+
+def partition_coo_parquet(path, key, n_parts, out_dir, prefix, chunk_size=5_000_000):
+    """
+    Hash-partition a COO Parquet file by `key` ("row" or "col") into
+    n_parts bucket files {prefix}_{p}.parquet, reading the input once.
+    Returns the list of bucket paths (None where a bucket is empty).
+    """
+    writers = [None] * n_parts
+    paths = [None] * n_parts
+
+    for offset, chunk in iter_parquet_chunks(path, chunk_size, columns=["row", "col", "val"]):
+        print(f"  Partitioning {path} by {key}: rows {offset} -> {offset+chunk.height}")
+        chunk = chunk.with_columns((pl.col(key) % n_parts).alias("part"))
+
+        for (p,), part in chunk.partition_by("part", as_dict=True, include_key=False).items():
+            table = part.to_arrow()
+            if writers[p] is None:
+                paths[p] = os.path.join(out_dir, f"{prefix}_{p}.parquet")
+                writers[p] = pq.ParquetWriter(paths[p], table.schema)
+            writers[p].write_table(table)
+
+    for w in writers:
+        if w is not None:
+            w.close()
+
+    return paths
+
+
+def matmul_coo_parquet_partitioned(A_path, B_path, C_path, n_parts=64, chunk_size=5_000_000, tmp_dir=None,
+                                   memory_budget=1 << 30, bin_rows=1_000_000):
+    """
+    Compute C = A x B by hash-partitioning A on col and B on row into n_parts
+    matching buckets, then joining only bucket pairs that share k.
+    Each input is read once to partition it and once more bucket by bucket.
+    Bucket products are summed in a spill-to-disk accumulator.
+    """
+
+    # Remove old output
+    if os.path.exists(C_path):
+        os.remove(C_path)
+
+    work_dir = tempfile.mkdtemp(prefix="coomul_", dir=tmp_dir or os.path.dirname(os.path.abspath(C_path)))
+    print(f"Partitioning A (by col) and B (by row) into {n_parts} buckets under {work_dir}")
+
+    try:
+        A_parts = partition_coo_parquet(A_path, "col", n_parts, work_dir, "A", chunk_size)
+        B_parts = partition_coo_parquet(B_path, "row", n_parts, work_dir, "B", chunk_size)
+
+        with COOAccumulator(memory_budget, bin_rows, work_dir) as acc:
+            for p in range(n_parts):
+                if A_parts[p] is None or B_parts[p] is None:
+                    continue
+
+                print(f"Processing bucket {p}")
+                A_bucket = pl.read_parquet(A_parts[p])
+                B_bucket = pl.read_parquet(B_parts[p])
+
+                joined = (
+                    A_bucket.join(B_bucket, left_on="col", right_on="row", how="inner")
+                    .with_columns((pl.col("val") * pl.col("val_right")).alias("mul"))
+                    .group_by(["row", "col_right"])
+                    .agg(pl.sum("mul").alias("val"))
+                    .rename({"col_right": "col"})
+                )
+
+                acc.add(joined)
+
+            nnz = acc.write_parquet(C_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"Done. Wrote C: {C_path} ({nnz} nonzero entries)")
+
+
+def multiply_bucket(A_part, B_part, prod_path, n_out, chunk_B=1_000_000, scale=1.0, rg_rows=1 << 20):
+    """
+    Worker: join one col bucket of A with the matching row bucket of B (both
+    read once, B in chunks) and write the partial products to prod_path,
+    routed by output row bin (row % n_out) into separate row groups.
+    Returns (prod_path, {bin: [row group indices]}).
+    """
+    A_bucket = pl.read_parquet(A_part)
+    writer = None
+    groups = {}
+    n_groups = 0
+
+    for _, B_chunk in iter_parquet_chunks(B_part, chunk_B, columns=["row", "col", "val"]):
+        joined = (
+            A_bucket.join(B_chunk, left_on="col", right_on="row", how="inner")
+            .with_columns((pl.col("val") * pl.col("val_right")).alias("mul"))
+            .group_by(["row", "col_right"])
+            .agg((pl.sum("mul") * scale).alias("val"))
+            .rename({"col_right": "col"})
+            .with_columns((pl.col("row") % n_out).alias("bin"))
+        )
+
+        for (q,), part in joined.partition_by("bin", as_dict=True, include_key=False).items():
+            table = part.to_arrow()
+            if writer is None:
+                writer = pq.ParquetWriter(prod_path, table.schema)
+            for lo in range(0, table.num_rows, rg_rows):
+                writer.write_table(table.slice(lo, rg_rows), row_group_size=rg_rows)
+                groups.setdefault(q, []).append(n_groups)
+                n_groups += 1
+
+    if writer is not None:
+        writer.close()
+
+    return prod_path, groups
+
+
+def reduce_row_bin(sources, part_path, memory_budget=1 << 28, bin_rows=1_000_000, tmp_dir=None):
+    """
+    Worker: sum the partial products routed to one output row bin, given as
+    [(prod_path, row group indices)], and write them to part_path.
+    Returns (part_path, nnz).
+    """
+    with COOAccumulator(memory_budget, bin_rows, tmp_dir) as acc:
+        for prod_path, row_groups in sources:
+            pf = pq.ParquetFile(prod_path)
+            for rg in row_groups:
+                acc.add(pl.from_arrow(pf.read_row_group(rg)))
+
+        return part_path, acc.write_parquet(part_path)
+
+
+def matmul_coo_parquet_parallel(A_path, B_path, C_dir, workers=4, n_parts=64, chunk_size=5_000_000,
+                                chunk_B=1_000_000, scale=1.0, memory_budget=1 << 30, bin_rows=1_000_000,
+                                tmp_dir=None):
+    """
+    Compute C = scale * A x B with a process pool, co-partitioned on k like
+    matmul_coo_parquet_partitioned: A is hash-partitioned by col and B by row
+    into n_parts matching buckets, so each bucket of A and of B is read
+    exactly once. Workers join bucket pairs and route the partial products
+    into n_parts output row bins (row % n_parts); a second round of workers
+    sums each bin into its own part file in C_dir, so parts hold disjoint
+    rows of C. C_dir/_manifest.json lists the parts; read C with
+    pl.scan_parquet(f"{C_dir}/*.parquet") or parquetChunks.dataset_files.
+    """
+
+    # Remove old output
+    if os.path.isdir(C_dir):
+        shutil.rmtree(C_dir)
+    elif os.path.exists(C_dir):
+        os.remove(C_dir)
+    os.makedirs(C_dir)
+
+    work_dir = tempfile.mkdtemp(prefix="coomul_", dir=tmp_dir or os.path.dirname(os.path.abspath(C_dir)))
+    print(f"Partitioning A (by col) and B (by row) into {n_parts} buckets under {work_dir}")
+
+    try:
+        A_parts = partition_coo_parquet(A_path, "col", n_parts, work_dir, "A", chunk_size)
+        B_parts = partition_coo_parquet(B_path, "row", n_parts, work_dir, "B", chunk_size)
+        pairs = [p for p in range(n_parts) if A_parts[p] is not None and B_parts[p] is not None]
 
-        # Write the accumulated result of this A_chunk
-        table = partial_results.to_arrow()
-        if first_chunk:
-            pq.write_table(table, C_path)
-            first_chunk = False
-        else:
-            pq.write_table(table, C_path, append=True)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            print(f"Multiplying {len(pairs)} buckets with {workers} workers")
+            futures = [
+                pool.submit(multiply_bucket, A_parts[p], B_parts[p], os.path.join(work_dir, f"prod_{p}.parquet"),
+                            n_parts, chunk_B, scale)
+                for p in pairs
+            ]
+            routes = {}  # output row bin -> [(prod_path, row groups)]
+            for f in futures:
+                prod_path, groups = f.result()
+                for q, row_groups in groups.items():
+                    routes.setdefault(q, []).append((prod_path, row_groups))
 
-        offset_A += chunk_A
+            print(f"Reducing {len(routes)} row bins with {workers} workers")
+            futures = [
+                pool.submit(reduce_row_bin, routes[q], os.path.join(C_dir, f"part-{q:05d}.parquet"),
+                            memory_budget // workers, bin_rows, work_dir)
+                for q in sorted(routes)
+            ]
+            parts = []
+            for f in futures:
+                part_path, nnz = f.result()
+                print(f"  Wrote {part_path} ({nnz} nonzero entries)")
+                parts.append({"path": os.path.basename(part_path), "num_rows": nnz})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
 
-    print(f"Done. Wrote C: {C_path}")
+    manifest = write_dataset_manifest(
+        C_dir, parts, format="coo", partition_key="row", n_partitions=n_parts,
+        inputs=[os.path.abspath(A_path), os.path.abspath(B_path)], scale=scale,
+    )
+    print(f"Done. Wrote C: {C_dir} ({len(parts)} parts, {manifest['num_rows']} nonzero entries)")
 
 
 # ----------------------------
@@ -97,9 +253,29 @@ if __name__ == "__main__":
     ap = argparse.ArgumentParser()
     ap.add_argument("A", help="COO Parquet A")
     ap.add_argument("B", help="COO Parquet B transposed")
-    ap.add_argument("C", help="Output COO Parquet C")
+    ap.add_argument("C", help="Output COO Parquet C (a directory of part files with --workers)")
     ap.add_argument("--chunk", type=int, default=5_000_000, help="Rows per chunk for A")
     ap.add_argument("--chunk_B", type=int, default=1_000_000, help="Rows per chunk for B")
+    ap.add_argument("--mode", choices=["chunked", "partitioned"], default="chunked",
+                    help="chunked: every A chunk x every B chunk; partitioned: bucket A by col and B by row first")
+    ap.add_argument("--parts", type=int, default=64, help="Number of buckets for --mode partitioned / --workers")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="Processes; >1 co-partitions A and B on k and writes C as a directory of part files")
+    ap.add_argument("--tmp_dir", default=None, help="Directory for bucket files and spill runs (default: next to C)")
+    ap.add_argument("--mem_mb", type=int, default=1024, help="Memory budget for partial products before spilling (MB)")
+    ap.add_argument("--bin_rows", type=int, default=1_000_000, help="Output rows per accumulator bin")
     args = ap.parse_args()
 
-    matmul_coo_parquet_full_chunked(args.A, args.B, args.C, chunk_A=args.chunk, chunk_B=args.chunk_B)
+    memory_budget = args.mem_mb * 1024 * 1024
+    if args.workers > 1:
+        matmul_coo_parquet_parallel(args.A, args.B, args.C, workers=args.workers, n_parts=args.parts,
+                                    chunk_size=args.chunk, chunk_B=args.chunk_B,
+                                    memory_budget=memory_budget, bin_rows=args.bin_rows, tmp_dir=args.tmp_dir)
+    elif args.mode == "partitioned":
+        matmul_coo_parquet_partitioned(args.A, args.B, args.C, n_parts=args.parts,
+                                       chunk_size=args.chunk, tmp_dir=args.tmp_dir,
+                                       memory_budget=memory_budget, bin_rows=args.bin_rows)
+    else:
+        matmul_coo_parquet_full_chunked(args.A, args.B, args.C, chunk_A=args.chunk, chunk_B=args.chunk_B,
+                                        memory_budget=memory_budget, bin_rows=args.bin_rows,
+                                        tmp_dir=args.tmp_dir)
@@ -1,15 +1,60 @@
 # python3 COOtoParquet.py A_coo.csv A_coo.parquet
+# python3 COOtoParquet.py A_coo.csv A_coo.parquet --workers 16               (parallel parse, one file)
+# python3 COOtoParquet.py A_coo.csv A_coo_dir --workers 16 --parts           (parallel parse, part files)
 
 import pyarrow as pa
 import pyarrow.csv as csv
 import pyarrow.parquet as pq
 import argparse
+import itertools
+import multiprocessing
 import os
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-def csv_coo_to_parquet(csv_path, parquet_path, block_size=32*1024*1024):
+from parquetChunks import write_dataset_manifest
+
+SCHEMA = pa.schema([
+    ("row", pa.int32()),
+    ("col", pa.int32()),
+    ("val", pa.float32()),
+])
+
+CONVERT_OPTS = csv.ConvertOptions(column_types={f.name: f.type for f in SCHEMA})
+
+
+def write_rows(writer, table, row_group_size):
+    """Write table through writer in row groups of row_group_size rows."""
+    for start in range(0, table.num_rows, row_group_size):
+        writer.write_table(table.slice(start, row_group_size), row_group_size=row_group_size)
+
+
+def write_regrouped(writer, tables, row_group_size):
+    """
+    Write a stream of tables through writer, buffering so every row group
+    except the last has exactly row_group_size rows. Returns the row count.
+    """
+    pending, pending_rows, total = [], 0, 0
+    for table in tables:
+        pending.append(table)
+        pending_rows += table.num_rows
+        total += table.num_rows
+        if pending_rows >= row_group_size:
+            merged = pa.concat_tables(pending)
+            full = (pending_rows // row_group_size) * row_group_size
+            write_rows(writer, merged.slice(0, full), row_group_size)
+            pending, pending_rows = [merged.slice(full)], pending_rows - full
+    if pending_rows:
+        writer.write_table(pa.concat_tables(pending))
+    return total
+
+
+def csv_coo_to_parquet(csv_path, parquet_path, block_size=32*1024*1024, row_group_size=1_000_000):
     """
     Convert a huge COO CSV (row, col, val) into Parquet using pure PyArrow streaming.
     row/col -> int32, val -> float32
+    block_size is the CSV read block in bytes; row_group_size is in rows.
     """
 
     if not os.path.exists(csv_path):
@@ -21,23 +66,7 @@ def csv_coo_to_parquet(csv_path, parquet_path, block_size=32*1024*1024):
         os.remove(parquet_path)
 
     print(f"Converting {csv_path} → {parquet_path}")
-    print(f"Block size: {block_size} bytes")
-
-    # schema
-    schema = pa.schema([
-        ("row", pa.int32()),
-        ("col", pa.int32()),
-        ("val", pa.float32()),
-    ])
-
-    # CSV conversion options
-    convert_opts = csv.ConvertOptions(
-        column_types={
-            "row": pa.int32(),
-            "col": pa.int32(),
-            "val": pa.float32(),
-        }
-    )
+    print(f"Block size: {block_size} bytes, row group size: {row_group_size} rows")
 
     read_opts = csv.ReadOptions(
         block_size=block_size,
@@ -48,29 +77,133 @@ def csv_coo_to_parquet(csv_path, parquet_path, block_size=32*1024*1024):
     reader = csv.open_csv(
         csv_path,
         read_options=read_opts,
-        convert_options=convert_opts
+        convert_options=CONVERT_OPTS
     )
 
-    writer = None
-    total_rows = 0
+    def batches():
+        total = 0
+        for i, batch in enumerate(reader):
+            total += batch.num_rows
+            print(f"  Batch {i+1}: {batch.num_rows} rows (total {total})")
+            yield pa.Table.from_batches([batch], schema=SCHEMA)
 
-    for i, batch in enumerate(reader):
-        # convert RecordBatch to Table
-        table = pa.Table.from_batches([batch], schema=schema)
+    # batches follow block_size; regroup them into row groups of row_group_size
+    writer = pq.ParquetWriter(parquet_path, SCHEMA)
+    total_rows = write_regrouped(writer, batches(), row_group_size)
+    writer.close()
 
-        if writer is None:
-            writer = pq.ParquetWriter(parquet_path, schema)
+    print(f"Done. Total rows: {total_rows}")
+    print(f"Output: {parquet_path}")
 
-        writer.write_table(table)
 
-        total_rows += table.num_rows
-        print(f"  Batch {i+1}: {table.num_rows} rows (total {total_rows})")
+def csv_byte_ranges(csv_path, range_bytes):
+    """
+    Split the body of a CSV (after the header line) into byte ranges of about
+    range_bytes, each moved forward to start right after a newline.
+    Returns (column_names, [(start, end), ...]).
+    """
+    size = os.path.getsize(csv_path)
+    with open(csv_path, "rb") as f:
+        header = f.readline()
+        names = header.decode().strip().split(",")
+        cuts = [len(header)]
+        pos = len(header) + range_bytes
+        while pos < size:
+            f.seek(pos - 1)
+            f.readline()               # finish the line that contains pos-1
+            pos = f.tell()
+            if pos >= size:
+                break
+            cuts.append(pos)
+            pos += range_bytes
+    cuts.append(size)
+    return names, [(lo, hi) for lo, hi in zip(cuts[:-1], cuts[1:]) if hi > lo]
+
+
+def parse_csv_range(csv_path, start, end, names, part_path=None, row_group_size=1_000_000):
+    """
+    Parse bytes [start, end) of a COO CSV. Writes them to part_path and
+    returns (part_path, num_rows), or returns the table if part_path is None.
+    """
+    with open(csv_path, "rb") as f:
+        f.seek(start)
+        buf = f.read(end - start)
+    table = csv.read_csv(
+        pa.BufferReader(buf),
+        read_options=csv.ReadOptions(column_names=names, use_threads=False),
+        convert_options=CONVERT_OPTS,
+    ).select(SCHEMA.names).cast(SCHEMA)
+    if part_path is None:
+        return table
+    with pq.ParquetWriter(part_path, SCHEMA) as writer:
+        write_rows(writer, table, row_group_size)
+    return part_path, table.num_rows
+
+
+def csv_coo_to_parquet_parallel(csv_path, out_path, workers=4, range_bytes=256*1024*1024,
+                                row_group_size=1_000_000, parts=False):
+    """
+    Convert a COO CSV with a process pool. The file is split at newline-aligned
+    byte ranges and each range is parsed by one worker.
+    parts=False: workers return the parsed ranges and the parent writes them
+    to one Parquet file in file order.
+    parts=True: each worker writes its range as out_path/part-NNNNN.parquet
+    and a _manifest.json lists the parts.
+    """
 
-    if writer:
-        writer.close()
+    if not os.path.exists(csv_path):
+        print(f"Error: CSV file not found: {csv_path}")
+        return
+
+    # overwrite old output
+    if os.path.isdir(out_path):
+        shutil.rmtree(out_path)
+    elif os.path.exists(out_path):
+        os.remove(out_path)
+
+    names, ranges = csv_byte_ranges(csv_path, range_bytes)
+    print(f"Converting {csv_path} → {out_path}")
+    print(f"{len(ranges)} byte ranges of ~{range_bytes} bytes, {workers} workers, "
+          f"row group size: {row_group_size} rows")
+
+    total_rows = 0
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        if parts:
+            os.makedirs(out_path)
+            futures = [
+                pool.submit(parse_csv_range, csv_path, lo, hi, names,
+                            os.path.join(out_path, f"part-{i:05d}.parquet"), row_group_size)
+                for i, (lo, hi) in enumerate(ranges)
+            ]
+            part_list = []
+            for f in futures:
+                part_path, n = f.result()
+                total_rows += n
+                part_list.append({"path": os.path.basename(part_path), "num_rows": n})
+                print(f"  Wrote {part_path}: {n} rows (total {total_rows})")
+            write_dataset_manifest(out_path, part_list, format="coo", source=os.path.abspath(csv_path))
+        else:
+            # keep a bounded window of ranges in flight so parsed tables don't pile up
+            def tables():
+                todo = iter(ranges)
+                window = deque(pool.submit(parse_csv_range, csv_path, lo, hi, names)
+                               for lo, hi in itertools.islice(todo, 2 * workers))
+                done = 0
+                while window:
+                    table = window.popleft().result()
+                    nxt = next(todo, None)
+                    if nxt is not None:
+                        window.append(pool.submit(parse_csv_range, csv_path, *nxt, names))
+                    done += 1
+                    print(f"  Range {done}/{len(ranges)}: {table.num_rows} rows")
+                    yield table
+
+            writer = pq.ParquetWriter(out_path, SCHEMA)
+            total_rows = write_regrouped(writer, tables(), row_group_size)
+            writer.close()
 
     print(f"Done. Total rows: {total_rows}")
-    print(f"Output: {parquet_path}")
+    print(f"Output: {out_path}")
 
 
 # ----------------------------
@@ -81,9 +214,25 @@ if __name__ == "__main__":
         description="Convert huge COO CSV (header: row,col,val) to Parquet (float32, chunked)."
     )
     parser.add_argument("csv_path", help="Input CSV file")
-    parser.add_argument("parquet_path", help="Output Parquet file")
-    parser.add_argument("--chunksize", type=int, default=1_000_000,
-                        help="Rows per chunk (default: 1M)")
+    parser.add_argument("parquet_path", help="Output Parquet file (directory with --parts)")
+    parser.add_argument("--row_group_size", "--chunksize", dest="row_group_size", type=int, default=1_000_000,
+                        help="Rows per Parquet row group (default: 1M)")
+    parser.add_argument("--block_mb", type=int, default=32,
+                        help="CSV read block size for the single-stream reader (MB)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes parsing byte ranges in parallel (default: 1, single stream)")
+    parser.add_argument("--range_mb", type=int, default=256, help="Bytes per range for --workers (MB)")
+    parser.add_argument("--parts", action="store_true",
+                        help="With --workers, write one part file per range into a directory")
     args = parser.parse_args()
 
-    csv_coo_to_parquet(args.csv_path, args.parquet_path, args.chunksize)
+    if args.parts and args.workers <= 1:
+        parser.error("--parts requires --workers > 1")
+
+    if args.workers > 1:
+        csv_coo_to_parquet_parallel(args.csv_path, args.parquet_path, workers=args.workers,
+                                    range_bytes=args.range_mb * 1024 * 1024,
+                                    row_group_size=args.row_group_size, parts=args.parts)
+    else:
+        csv_coo_to_parquet(args.csv_path, args.parquet_path, block_size=args.block_mb * 1024 * 1024,
+                           row_group_size=args.row_group_size)
@@ -0,0 +1,144 @@
+# python3 CSVtoParquet.py A.csv A.parquet                                  (headerless, float32)
+# python3 CSVtoParquet.py A.csv A.parquet --row_group_size 65536 --compression zstd
+# python3 CSVtoParquet.py A.csv A_tiles --tile_rows 5000 --tile_cols 5000   (tile directory like genMx)
+
+import pyarrow as pa
+import pyarrow.csv as csv
+import pyarrow.parquet as pq
+import argparse
+import os
+import shutil
+
+from COOtoParquet import write_regrouped
+
+
+def csv_column_count(csv_path, delimiter=","):
+    """Number of fields in the first line of a CSV."""
+    with open(csv_path, "rb") as f:
+        return f.readline().count(delimiter.encode()) + 1
+
+
+def open_dense_csv(csv_path, header=False, block_size=64*1024*1024, delimiter=","):
+    """
+    Streaming multithreaded reader over a wide numeric CSV with an explicit
+    float32 schema and columns named col{i}. Type inference is skipped, so
+    every block is parsed straight into float32 Arrow columns.
+    """
+    n_cols = csv_column_count(csv_path, delimiter)
+    names = [f"col{i}" for i in range(n_cols)]
+    schema = pa.schema([(n, pa.float32()) for n in names])
+    reader = csv.open_csv(
+        csv_path,
+        read_options=csv.ReadOptions(
+            column_names=names, skip_rows=1 if header else 0,
+            block_size=block_size, use_threads=True,
+        ),
+        parse_options=csv.ParseOptions(delimiter=delimiter),
+        convert_options=csv.ConvertOptions(column_types=dict(zip(names, schema.types))),
+    )
+    return schema, reader
+
+
+def csv_to_parquet_dense(csv_path, parquet_path, header=False, block_size=64*1024*1024,
+                         row_group_size=65536, compression="zstd", delimiter=","):
+    """
+    Convert a wide numeric CSV to one float32 Parquet file, block by block.
+    Peak memory is about one parse block plus one row group.
+    """
+    if not os.path.exists(csv_path):
+        print(f"Error: CSV file not found: {csv_path}")
+        return
+
+    if os.path.exists(parquet_path):
+        os.remove(parquet_path)
+
+    schema, reader = open_dense_csv(csv_path, header, block_size, delimiter)
+    print(f"Converting {csv_path} ({len(schema)} columns) → {parquet_path}")
+    print(f"Block size: {block_size} bytes, row group size: {row_group_size} rows, compression: {compression}")
+
+    def tables():
+        total = 0
+        for i, batch in enumerate(reader):
+            total += batch.num_rows
+            print(f"  Block {i+1}: {batch.num_rows} rows (total {total})")
+            yield pa.Table.from_batches([batch], schema=schema)
+
+    writer = pq.ParquetWriter(parquet_path, schema, compression=compression)
+    total_rows = write_regrouped(writer, tables(), row_group_size)
+    writer.close()
+    print(f"Done: {parquet_path} ({total_rows} x {len(schema)})")
+
+
+def csv_to_parquet_tiles(csv_path, out_dir, tile_rows=5000, tile_cols=5000, header=False,
+                         block_size=64*1024*1024, compression="zstd", delimiter=","):
+    """
+    Convert a wide numeric CSV into tile_{bi}_{bj}.parquet files of
+    tile_rows x tile_cols (the layout of genMx.generate_parquet_2d_tiled,
+    read by matmul.tiled_matmul). Parsed blocks are buffered until one tile
+    row is complete, so peak memory is about tile_rows full rows.
+    """
+    if not os.path.exists(csv_path):
+        print(f"Error: CSV file not found: {csv_path}")
+        return
+
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir)
+
+    schema, reader = open_dense_csv(csv_path, header, block_size, delimiter)
+    n_cols = len(schema)
+    n_bj = (n_cols + tile_cols - 1) // tile_cols
+    print(f"Converting {csv_path} ({n_cols} columns) → {out_dir} (tiles {tile_rows} x {tile_cols})")
+
+    def write_tile_row(bi, table):
+        for bj in range(n_bj):
+            c0 = bj * tile_cols
+            tile = table.select(schema.names[c0:c0 + tile_cols])
+            pq.write_table(tile, f"{out_dir}/tile_{bi:04d}_{bj:04d}.parquet", compression=compression)
+        print(f"  Tile row {bi}: {table.num_rows} rows, {n_bj} tiles")
+
+    pending, pending_rows, bi, total = [], 0, 0, 0
+    for batch in reader:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        total += batch.num_rows
+        while pending_rows >= tile_rows:
+            table = pa.Table.from_batches(pending, schema=schema)
+            write_tile_row(bi, table.slice(0, tile_rows))
+            bi += 1
+            rest = table.slice(tile_rows)
+            pending, pending_rows = rest.to_batches(), rest.num_rows
+    if pending_rows:
+        write_tile_row(bi, pa.Table.from_batches(pending, schema=schema))
+        bi += 1
+    print(f"Done: {out_dir} ({total} x {n_cols}, {bi} x {n_bj} tiles)")
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a wide numeric CSV to float32 Parquet (streaming)")
+    parser.add_argument("csv_path", help="Input CSV file (headerless unless --header)")
+    parser.add_argument("parquet_path", help="Output Parquet file (tile directory with --tile_rows/--tile_cols)")
+    parser.add_argument("--header", action="store_true", help="Skip a header line (columns are always col{i})")
+    parser.add_argument("--delimiter", default=",", help="Field delimiter")
+    parser.add_argument("--block_mb", type=int, default=64, help="CSV parse block size (MB)")
+    parser.add_argument("--row_group_size", type=int, default=65536, help="Rows per Parquet row group")
+    parser.add_argument("--compression", default="zstd",
+                        choices=["zstd", "snappy", "lz4", "gzip", "brotli", "none"], help="Parquet codec")
+    parser.add_argument("--tile_rows", type=int, default=0, help="Write tiles of this many rows")
+    parser.add_argument("--tile_cols", type=int, default=0, help="Write tiles of this many columns")
+    args = parser.parse_args()
+
+    block_size = args.block_mb * 1024 * 1024
+    if args.tile_rows or args.tile_cols:
+        csv_to_parquet_tiles(args.csv_path, args.parquet_path,
+                             tile_rows=args.tile_rows or args.row_group_size,
+                             tile_cols=args.tile_cols or csv_column_count(args.csv_path, args.delimiter),
+                             header=args.header, block_size=block_size,
+                             compression=args.compression, delimiter=args.delimiter)
+    else:
+        csv_to_parquet_dense(args.csv_path, args.parquet_path, header=args.header, block_size=block_size,
+                             row_group_size=args.row_group_size, compression=args.compression,
+                             delimiter=args.delimiter)
@@ -1,41 +1,84 @@
+# python3 IPCtoParquet.py A.arrow A.parquet
+# python3 IPCtoParquet.py A.arrow A_dir --threads 8        (parallel encoding, one part file per thread)
+
+import pyarrow as pa
 import pyarrow.ipc as ipc
-import polars as pl
+import pyarrow.parquet as pq
 import argparse
 import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from parquetChunks import write_dataset_manifest
+
+def float32_schema(schema):
+    """Same column names as schema, all float32."""
+    return pa.schema([(name, pa.float32()) for name in schema.names])
+
+
+def write_batch_range(reader, schema, path, start, end, compression):
+    """Cast record batches [start, end) of an open IPC reader to schema and write them to path."""
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression=compression) as writer:
+        for i in range(start, end):
+            batch = reader.get_batch(i).cast(schema)
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
 
-def arrowipc_to_parquet_chunked(ipc_path, parquet_path):
+
+def arrowipc_to_parquet_chunked(ipc_path, parquet_path, compression="zstd", threads=1):
     """
-    Convert ArrowIPC / Feather to Parquet with all columns as float32 in batches
+    Convert ArrowIPC / Feather to Parquet with all columns as float32 in batches.
+    The IPC file is memory-mapped, batches are cast with Arrow compute and
+    written through one persistent ParquetWriter (one row group per batch).
+    threads > 1: parquet_path is a directory; each thread encodes a contiguous
+    range of batches into its own part file, listed in _manifest.json.
     """
     if not os.path.exists(ipc_path):
         print(f"Error: ArrowIPC file not found: {ipc_path}")
         return
 
     print(f"Opening ArrowIPC: {ipc_path}")
-    reader = ipc.open_file(ipc_path)
+    reader = ipc.open_file(pa.memory_map(ipc_path, "r"))
     num_batches = reader.num_record_batches
+    schema = float32_schema(reader.schema)
     print(f"Total record batches: {num_batches}")
 
-    # Remove existing Parquet file if exists
-    if os.path.exists(parquet_path):
+    # Remove existing output if exists
+    if os.path.isdir(parquet_path):
+        shutil.rmtree(parquet_path)
+    elif os.path.exists(parquet_path):
         os.remove(parquet_path)
 
-    for i in range(num_batches):
-        batch = reader.get_batch(i)
-        df = pl.from_arrow(batch)
-
-        # Cast all columns to float32
-        df = df.with_columns([pl.col(c).cast(pl.Float32) for c in df.columns])
-
-        # Append to Parquet
-        if i == 0:
-            df.write_parquet(parquet_path)  # first batch creates the file
-        else:
-            df.write_parquet(parquet_path, append=True)
+    if threads <= 1:
+        with pq.ParquetWriter(parquet_path, schema, compression=compression) as writer:
+            for i in range(num_batches):
+                batch = reader.get_batch(i).cast(schema)
+                writer.write_batch(batch)
+                print(f"Processed batch {i} ({batch.num_rows} rows)")
+        print(f"Conversion finished: {parquet_path}")
+        return
 
-        print(f"Processed batch {i} ({len(df)} rows)")
+    os.makedirs(parquet_path)
+    # at least one part, so an empty input still gives a readable (empty) dataset
+    n_parts = max(1, min(threads, num_batches))
+    bounds = [num_batches * p // n_parts for p in range(n_parts + 1)]
+    paths = [os.path.join(parquet_path, f"part-{p:05d}.parquet") for p in range(n_parts)]
+    # Arrow releases the GIL while casting and encoding, so threads run in parallel
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [
+            pool.submit(write_batch_range, reader, schema, paths[p], bounds[p], bounds[p + 1], compression)
+            for p in range(n_parts)
+        ]
+        parts = []
+        for p, f in enumerate(futures):
+            rows = f.result()
+            parts.append({"path": os.path.basename(paths[p]), "num_rows": rows})
+            print(f"Wrote {paths[p]}: batches {bounds[p]}-{bounds[p + 1]} ({rows} rows)")
 
-    print(f"Conversion finished: {parquet_path}")
+    write_dataset_manifest(parquet_path, parts, format="dense", source=os.path.abspath(ipc_path))
+    print(f"Conversion finished: {parquet_path} ({n_parts} parts)")
 
 # ----------------------------
 # CLI using argparse
@@ -43,7 +86,12 @@ def arrowipc_to_parquet_chunked(ipc_path, parquet_path):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Chunked ArrowIPC / Feather to Parquet (float32)")
     parser.add_argument("ipc_path", help="Input ArrowIPC / Feather file path")
-    parser.add_argument("parquet_path", help="Output Parquet file path")
+    parser.add_argument("parquet_path", help="Output Parquet file path (directory with --threads > 1)")
+    parser.add_argument("--compression", default="zstd",
+                        choices=["zstd", "snappy", "lz4", "gzip", "brotli", "none"], help="Parquet codec")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="Encoding threads; >1 writes one part file per thread into a directory")
 
     args = parser.parse_args()
-    arrowipc_to_parquet_chunked(args.ipc_path, args.parquet_path)
+    arrowipc_to_parquet_chunked(args.ipc_path, args.parquet_path, compression=args.compression,
+                                threads=args.threads)
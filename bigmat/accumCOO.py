@@ -0,0 +1,117 @@
+import polars as pl
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+import os
+import shutil
+import tempfile
+
+SCHEMA = pa.schema([("row", pa.int32()), ("col", pa.int32()), ("val", pa.float32())])
+
+
+class COOAccumulator:
+    """
+    Bounded-memory accumulator for partial COO products (row, col, val).
+
+    Partial products are buffered in memory until `memory_budget` bytes, then
+    pre-aggregated, binned by output row range (`bin_rows` rows per bin) and
+    spilled to temporary Arrow IPC runs. `write_parquet` merge-reduces each
+    bin once and writes the summed result, bin by bin, to a single Parquet file.
+    Peak memory is one buffer plus the largest bin. The output file is always
+    written, with the (row, col, val) schema of the added products (SCHEMA if
+    nothing was added), even when it has no rows.
+    Use it as a context manager so the spill directory is removed even when
+    accumulation fails.
+    """
+
+    def __init__(self, memory_budget=1 << 30, bin_rows=1_000_000, tmp_dir=None):
+        self.memory_budget = memory_budget
+        self.bin_rows = bin_rows
+        self.work_dir = tempfile.mkdtemp(prefix="cooacc_", dir=tmp_dir)
+        self.buffer = []
+        self.buffer_bytes = 0
+        self.runs = {}  # bin -> list of IPC run paths
+        self.n_spills = 0
+        self.schema = None
+
+    def add(self, df):
+        """Add a DataFrame of partial products with columns row, col, val."""
+        df = df.select(["row", "col", "val"])
+        if self.schema is None:
+            self.schema = df.to_arrow().schema
+        if df.height == 0:
+            return
+        self.buffer.append(df)
+        self.buffer_bytes += df.estimated_size()
+        if self.buffer_bytes >= self.memory_budget:
+            self.spill()
+
+    def spill(self):
+        """Pre-aggregate the buffer and write one IPC run per touched row bin."""
+        if not self.buffer:
+            return
+
+        combined = (
+            pl.concat(self.buffer)
+            .group_by(["row", "col"])
+            .agg(pl.sum("val").alias("val"))
+            .with_columns((pl.col("row") // self.bin_rows).alias("bin"))
+        )
+        self.buffer = []
+        self.buffer_bytes = 0
+
+        for (b,), part in combined.partition_by("bin", as_dict=True, include_key=False).items():
+            run_path = os.path.join(self.work_dir, f"bin_{b}_run_{self.n_spills}.arrow")
+            table = part.to_arrow()
+            with ipc.new_file(run_path, table.schema) as writer:
+                writer.write_table(table)
+            self.runs.setdefault(b, []).append(run_path)
+
+        print(f"  Spilled run {self.n_spills}: {combined.height} entries in {len(self.runs)} bins")
+        self.n_spills += 1
+
+    def write_parquet(self, out_path):
+        """Merge-reduce every bin and write the final C to out_path. Returns nnz."""
+        self.spill()
+
+        if os.path.exists(out_path):
+            os.remove(out_path)
+
+        writer = pq.ParquetWriter(out_path, self.schema or SCHEMA)
+        total = 0
+        try:
+            for b in sorted(self.runs):
+                tables = [
+                    ipc.open_file(pa.memory_map(run_path)).read_all()
+                    for run_path in self.runs[b]
+                ]
+
+                reduced = (
+                    pl.from_arrow(pa.concat_tables(tables))
+                    .group_by(["row", "col"])
+                    .agg(pl.sum("val").alias("val"))
+                    .sort(["row", "col"])
+                )
+
+                table = reduced.to_arrow().cast(writer.schema)
+                writer.write_table(table)
+                total += table.num_rows
+
+                for run_path in self.runs[b]:
+                    os.remove(run_path)
+        finally:
+            writer.close()
+            self.close()
+
+        return total
+
+    def close(self):
+        """Remove all temporary runs."""
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        self.runs = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
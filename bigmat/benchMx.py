@@ -0,0 +1,357 @@
+# python3 benchMx.py run bench.json                                        (default size grid)
+# python3 benchMx.py run bench.json --dense_sizes 2000 5000 --coo_sizes 100000 --densities 1e-4 --repeat 3
+# python3 benchMx.py run bench.json --stages transpose spgemm spgemm_parallel --workers 16 --work_dir /data/bench
+# python3 benchMx.py compare base.json bench.json --threshold 0.10         (exit status 1 on regressions)
+
+import numpy as np
+import polars as pl
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+import argparse
+import contextlib
+import glob
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# stage -> matrix kinds it runs on
+STAGES = {
+    "convert": ("dense", "coo"),
+    "transpose": ("dense", "coo"),
+    "std": ("dense", "coo"),
+    "spgemm": ("coo",),
+    "spgemm_partitioned": ("coo",),
+    "spgemm_parallel": ("coo",),
+    "cov": ("coo",),
+    "matmul": ("dense",),
+}
+
+
+# ----------------------------
+# Inputs
+# ----------------------------
+def dense_input(work_dir, n, seed):
+    """Square n x n dense Parquet matrix (and an Arrow IPC copy), generated once per seed."""
+    from genMx import generate_parquet_row_chunked
+
+    path = os.path.join(work_dir, f"dense_{n}_s{seed}.parquet")
+    if not os.path.exists(path):
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_parquet_row_chunked(path, n, n, row_chunk=min(n, 65536), seed=seed)
+    ipc_path = path[:-len(".parquet")] + ".arrow"
+    if not os.path.exists(ipc_path):
+        table = pq.read_table(path)
+        with ipc.new_file(ipc_path, table.schema) as writer:
+            writer.write_table(table)
+    return path
+
+
+def coo_input(work_dir, n, density, seed):
+    """Square n x n COO Parquet matrix with exactly round(density * n^2) nonzeros."""
+    from genCOO import generate_coo
+
+    path = os.path.join(work_dir, f"coo_{n}_{density:g}_s{seed}.parquet")
+    if not os.path.exists(path):
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_coo(path, n, n, int(round(density * n * n)), seed=seed)
+    return path
+
+
+def bench_cases(dense_sizes, coo_sizes, densities):
+    """(kind, n, density) of every point of the size grid."""
+    return [("dense", n, None) for n in dense_sizes] + \
+           [("coo", n, d) for n in coo_sizes for d in densities]
+
+
+def case_name(kind, n, density):
+    return f"dense n={n}" if kind == "dense" else f"coo n={n} density={density:g}"
+
+
+# ----------------------------
+# Stages (run in a fresh process each)
+# ----------------------------
+def run_stage(stage, kind, inp, out, n, workers=1):
+    """
+    Run one pipeline stage on inp, writing to out. Returns the number of
+    matrix entries it processed (n^2 for dense, nnz for COO).
+    """
+    units = n * n if kind == "dense" else pq.read_metadata(inp).num_rows
+
+    if stage == "convert" and kind == "dense":
+        from IPCtoParquet import arrowipc_to_parquet_chunked
+        arrowipc_to_parquet_chunked(inp[:-len(".parquet")] + ".arrow", out)
+    elif stage == "convert":
+        from csrMx import coo_to_csr
+        coo_to_csr(inp, out)
+    elif stage == "transpose" and kind == "dense":
+        from tpParquet import transpose_parquet_blockwise
+        transpose_parquet_blockwise(inp, out)
+    elif stage == "transpose":
+        from tpCOO import transpose_coo_parquet_chunked
+        transpose_coo_parquet_chunked(inp, out)
+    elif stage == "std" and kind == "dense":
+        from stdParquet import standardize_parquet
+        standardize_parquet(inp, out)
+    elif stage == "std":
+        from stdCOO import standardize_coo_parquet
+        standardize_coo_parquet(inp, out, n)
+    elif stage == "spgemm":
+        from COOmul import matmul_coo_parquet_full_chunked
+        matmul_coo_parquet_full_chunked(inp, inp, out)
+    elif stage == "spgemm_partitioned":
+        from COOmul import matmul_coo_parquet_partitioned
+        matmul_coo_parquet_partitioned(inp, inp, out)
+    elif stage == "spgemm_parallel":
+        from COOmul import matmul_coo_parquet_parallel
+        matmul_coo_parquet_parallel(inp, inp, out, workers=workers)
+    elif stage == "cov":
+        from COOcov import gram_coo_parquet_sym
+        gram_coo_parquet_sym(inp, out, n)
+    elif stage == "matmul":
+        from matmul import dense_block_matmul
+        dense_block_matmul(inp, inp, out)
+    else:
+        raise ValueError(f"unknown stage {stage!r}")
+    return units
+
+
+def proc_io():
+    """Bytes this process has read/written: logical (rchar/wchar) and from storage."""
+    try:
+        with open("/proc/self/io") as f:
+            return {k: int(v) for k, v in (line.split(":") for line in f)}
+    except OSError:
+        return {}
+
+
+def path_bytes(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(f) for f in glob.glob(os.path.join(path, "**"), recursive=True)
+                   if os.path.isfile(f))
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+@contextlib.contextmanager
+def quiet_stdout():
+    """Silence stdout at the file-descriptor level, so worker processes a stage spawns are quiet too."""
+    sys.stdout.flush()
+    saved = os.dup(1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved, 1)
+        os.close(saved)
+        os.close(devnull)
+
+
+def measure(stage, kind, inp, out, n, workers=1):
+    """
+    Child process entry point: run one stage and report wall time, peak RSS
+    (this process or the largest worker it spawned) and I/O (including that
+    of reaped workers).
+    """
+    # make the stage do its own statistics pass instead of reusing a sidecar
+    if os.path.exists(inp + ".stats.npz"):
+        os.remove(inp + ".stats.npz")
+    io0 = proc_io()
+    t0 = time.perf_counter()
+    with quiet_stdout():
+        units = run_stage(stage, kind, inp, out, n, workers)
+    wall = time.perf_counter() - t0
+    io1 = proc_io()
+    return {
+        "wall_s": wall,
+        "units": units,
+        "peak_rss": max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) * 1024,
+        "read_bytes": io1.get("rchar", 0) - io0.get("rchar", 0),
+        "write_bytes": io1.get("wchar", 0) - io0.get("wchar", 0),
+        "disk_read_bytes": io1.get("read_bytes", 0) - io0.get("read_bytes", 0),
+        "disk_write_bytes": io1.get("write_bytes", 0) - io0.get("write_bytes", 0),
+        "output_bytes": path_bytes(out),
+    }
+
+
+def remove_path(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+    for f in glob.glob(path + ".*.npz"):
+        os.remove(f)
+
+
+def measure_isolated(stage, kind, inp, out, n, workers=1):
+    """Run measure() in a fresh spawned process, so peak RSS belongs to this stage alone."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(measure, stage, kind, inp, out, n, workers).result()
+
+
+# ----------------------------
+# Run
+# ----------------------------
+def run_benchmarks(results_path, dense_sizes=(1000, 2000), coo_sizes=(10000, 20000), densities=(1e-3, 1e-4),
+                   stages=tuple(STAGES), repeat=1, seed=0, work_dir="bench_data", keep=False, workers=None):
+    """
+    Run every stage on every matching point of the size grid and save the
+    results to JSON. Inputs are generated once (seeded) and reused; each
+    measurement runs in its own process and the fastest of repeat runs is
+    kept. Throughput is entries/s and (input + output bytes) / wall time.
+    workers is the process count of spgemm_parallel (default: all CPUs).
+    """
+    workers = workers or os.cpu_count()
+    os.makedirs(work_dir, exist_ok=True)
+    out_dir = os.path.join(work_dir, "out")
+    os.makedirs(out_dir, exist_ok=True)
+
+    results = []
+    for kind, n, density in bench_cases(dense_sizes, coo_sizes, densities):
+        todo = [s for s in stages if kind in STAGES[s]]
+        if not todo:
+            continue
+        name = case_name(kind, n, density)
+        print(f"Preparing input: {name}")
+        inp = dense_input(work_dir, n, seed) if kind == "dense" else coo_input(work_dir, n, density, seed)
+        in_bytes = path_bytes(inp)
+
+        for stage in todo:
+            ext = {"convert": ".csr" if kind == "coo" else ".parquet", "matmul": "_dir",
+                   "spgemm_parallel": "_dir"}.get(stage, ".parquet")
+            out = os.path.join(out_dir, f"{stage}_{os.path.basename(inp)[:-len('.parquet')]}{ext}")
+            if stage == "convert" and kind == "dense":
+                in_bytes_stage = path_bytes(inp[:-len(".parquet")] + ".arrow")
+            else:
+                in_bytes_stage = in_bytes
+            record = {"stage": stage, "kind": kind, "case": name, "n": n, "density": density,
+                      "input_bytes": in_bytes_stage}
+            runs = []
+            try:
+                for _ in range(repeat):
+                    remove_path(out)
+                    runs.append(measure_isolated(stage, kind, inp, out, n, workers))
+            except Exception as e:
+                record["error"] = f"{type(e).__name__}: {e}"
+                print(f"  {stage:18s} {name}: FAILED ({record['error']})")
+                results.append(record)
+                continue
+            finally:
+                if not keep:
+                    remove_path(out)
+
+            best = min(runs, key=lambda r: r["wall_s"])
+            record |= best
+            record["wall_s_all"] = [r["wall_s"] for r in runs]
+            record["units_per_s"] = best["units"] / best["wall_s"]
+            record["gb_per_s"] = (in_bytes_stage + best["output_bytes"]) / best["wall_s"] / 1e9
+            results.append(record)
+            print(f"  {stage:18s} {name}: {best['wall_s']:.3f} s, {record['units_per_s']:.3g} entries/s, "
+                  f"{record['gb_per_s']:.3f} GB/s, peak RSS {best['peak_rss'] / 2**20:.0f} MiB")
+
+    meta = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pyarrow": pa.__version__,
+        "polars": pl.__version__,
+        "seed": seed,
+        "repeat": repeat,
+        "workers": workers,
+        "grid": {"dense_sizes": list(dense_sizes), "coo_sizes": list(coo_sizes), "densities": list(densities)},
+    }
+    with open(results_path, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=1)
+    print(f"Results saved to: {results_path}")
+    return results
+
+
+# ----------------------------
+# Compare
+# ----------------------------
+def compare_results(base_path, new_path, threshold=0.10, min_wall=0.05):
+    """
+    Compare two result files stage by stage. A stage regresses when its wall
+    time or peak RSS grows by more than threshold (relative); wall-time
+    differences under min_wall seconds are treated as noise.
+    Returns the list of regressions.
+    """
+    def load(path):
+        with open(path) as f:
+            return {(r["stage"], r["case"]): r for r in json.load(f)["results"]}
+
+    base, new = load(base_path), load(new_path)
+    regressions = []
+    print(f"{'stage':18s} {'case':32s} {'base s':>9s} {'new s':>9s} {'time':>8s} {'RSS':>8s}")
+    for key in sorted(base.keys() | new.keys()):
+        b, c = base.get(key), new.get(key)
+        if b is None or c is None:
+            print(f"{key[0]:18s} {key[1]:32s} only in {'new' if b is None else 'base'}")
+            continue
+        if "error" in b or "error" in c:
+            status = "REGRESSION" if "error" in c and "error" not in b else ""
+            print(f"{key[0]:18s} {key[1]:32s} error: {c.get('error', '-')}  {status}")
+            if status:
+                regressions.append((key, "error", c["error"]))
+            continue
+        dt = c["wall_s"] / b["wall_s"] - 1.0
+        dm = c["peak_rss"] / b["peak_rss"] - 1.0
+        flags = []
+        if dt > threshold and c["wall_s"] - b["wall_s"] > min_wall:
+            flags.append("time")
+            regressions.append((key, "wall_s", dt))
+        if dm > threshold:
+            flags.append("RSS")
+            regressions.append((key, "peak_rss", dm))
+        print(f"{key[0]:18s} {key[1]:32s} {b['wall_s']:9.3f} {c['wall_s']:9.3f} {dt:+8.1%} {dm:+8.1%}"
+              f"{'  REGRESSION (' + ', '.join(flags) + ')' if flags else ''}")
+
+    print(f"{len(regressions)} regressions" if regressions else "No regressions")
+    return regressions
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the bigmat pipeline stages across a size grid")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="Run the benchmarks and save results to JSON")
+    p.add_argument("results", help="Output JSON file")
+    p.add_argument("--dense_sizes", type=int, nargs="*", default=[1000, 2000], help="n of the n x n dense inputs")
+    p.add_argument("--coo_sizes", type=int, nargs="*", default=[10000, 20000], help="n of the n x n COO inputs")
+    p.add_argument("--densities", type=float, nargs="*", default=[1e-3, 1e-4], help="Densities of the COO inputs")
+    p.add_argument("--stages", nargs="*", choices=list(STAGES), default=list(STAGES), help="Stages to run")
+    p.add_argument("--repeat", type=int, default=1, help="Runs per measurement (the fastest is kept)")
+    p.add_argument("--seed", type=int, default=0, help="Random seed of the generated inputs")
+    p.add_argument("--work_dir", default="bench_data", help="Directory for inputs and outputs")
+    p.add_argument("--keep", action="store_true", help="Keep stage outputs")
+    p.add_argument("--workers", type=int, default=None, help="Processes for spgemm_parallel (default: all CPUs)")
+
+    p = sub.add_parser("compare", help="Compare two result files and flag regressions")
+    p.add_argument("base", help="Baseline results JSON")
+    p.add_argument("new", help="New results JSON")
+    p.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown / RSS growth that counts")
+    p.add_argument("--min_wall", type=float, default=0.05, help="Ignore wall-time differences below this (s)")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run_benchmarks(args.results, args.dense_sizes, args.coo_sizes, args.densities, args.stages,
+                       repeat=args.repeat, seed=args.seed, work_dir=args.work_dir, keep=args.keep,
+                       workers=args.workers)
+    else:
+        sys.exit(1 if compare_results(args.base, args.new, args.threshold, args.min_wall) else 0)
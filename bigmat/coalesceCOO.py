@@ -0,0 +1,188 @@
+# python3 coalesceCOO.py A_coo.parquet A_unique.parquet --mem_mb 1024
+# python3 coalesceCOO.py A_coo.parquet A_unique.parquet --drop_zeros
+
+import numpy as np
+import polars as pl
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+import argparse
+import os
+import shutil
+import tempfile
+
+from parquetChunks import iter_parquet_chunks, column_max
+from sortCOO import save_coo_index, index_path
+
+SCHEMA = pa.schema([("row", pa.int32()), ("col", pa.int32()), ("val", pa.float32())])
+
+
+def write_sorted_run(df, run_path, batch_rows):
+    """Sum duplicates of an in-memory buffer and write it as a sorted IPC run of batch_rows batches."""
+    table = (
+        df.group_by(["row", "col"])
+        .agg(pl.sum("val"))
+        .sort(["row", "col"])
+        .to_arrow()
+        .cast(SCHEMA)
+    )
+    with ipc.new_file(run_path, SCHEMA) as writer:
+        for batch in table.to_batches(max_chunksize=batch_rows):
+            writer.write_batch(batch)
+    return table.num_rows
+
+
+def merge_runs(run_paths, n_cols):
+    """
+    k-way merge of sorted, duplicate-free IPC runs, yielding sorted unique
+    (row, col, val) DataFrames. The runs are memory-mapped and consumed one
+    batch each at a time: every step takes all entries up to the smallest
+    "last key" among the current batches, which no later batch can precede.
+    """
+    readers = [ipc.open_file(pa.memory_map(p)) for p in run_paths]
+    pos = [0] * len(readers)
+    current = [None] * len(readers)
+
+    def load(k):
+        while pos[k] < readers[k].num_record_batches:
+            batch = pl.from_arrow(pa.Table.from_batches([readers[k].get_batch(pos[k])]))
+            pos[k] += 1
+            if batch.height:
+                return batch.with_columns((pl.col("row").cast(pl.Int64) * n_cols + pl.col("col")).alias("key"))
+        return None
+
+    for k in range(len(readers)):
+        current[k] = load(k)
+
+    while True:
+        live = [k for k in range(len(readers)) if current[k] is not None]
+        if not live:
+            return
+        bound = min(current[k]["key"][-1] for k in live)
+
+        pieces = []
+        for k in live:
+            cut = int(np.searchsorted(current[k]["key"].to_numpy(), bound, side="right"))
+            pieces.append(current[k].slice(0, cut))
+            current[k] = current[k].slice(cut) if cut < current[k].height else load(k)
+
+        yield (
+            pl.concat(pieces)
+            .group_by("key", maintain_order=False)
+            .agg(pl.first("row"), pl.first("col"), pl.sum("val"))
+            .sort("key")
+            .select(["row", "col", "val"])
+        )
+
+
+def coalesce_coo_parquet(input_path, output_path, chunk_size=1_000_000, memory_budget=1 << 30,
+                         row_group_size=1_000_000, batch_rows=65536, drop_zeros=False, tmp_dir=None):
+    """
+    Sum duplicate (row, col) entries of a COO Parquet file out of core and
+    write canonical COO: sorted by (row, col), one entry per position.
+
+    Pass 1 buffers input chunks up to memory_budget, sums duplicates within
+    the buffer and writes it as a sorted Arrow IPC run. Pass 2 k-way merges
+    the runs, summing duplicates across runs, and streams the result into
+    one ParquetWriter. The output gets a sortCOO row index, so sortCOO/csrMx
+    can use it without sorting again.
+    """
+
+    if os.path.exists(output_path):
+        os.remove(output_path)
+
+    meta = pq.read_metadata(input_path)
+    maxes = {name: column_max(input_path, name, chunk_size) for name in ("row", "col")}
+    n_rows, n_cols = maxes["row"] + 1, maxes["col"] + 1
+    print(f"Coalescing {input_path}: {meta.num_rows} entries, {n_rows}x{n_cols}")
+
+    work_dir = tempfile.mkdtemp(prefix="coalesce_", dir=tmp_dir or os.path.dirname(os.path.abspath(output_path)))
+    try:
+        # ---------------------------------------------------
+        # Pass 1: sorted, locally summed runs
+        # ---------------------------------------------------
+        runs = []
+        buffer, buffer_bytes = [], 0
+
+        def flush():
+            nonlocal buffer, buffer_bytes
+            if not buffer:
+                return
+            run_path = os.path.join(work_dir, f"run_{len(runs)}.arrow")
+            n = write_sorted_run(pl.concat(buffer), run_path, batch_rows)
+            runs.append(run_path)
+            print(f"  Run {len(runs) - 1}: {n} entries")
+            buffer, buffer_bytes = [], 0
+
+        for offset, chunk in iter_parquet_chunks(input_path, chunk_size, columns=["row", "col", "val"]):
+            buffer.append(chunk.with_columns(
+                pl.col("row").cast(pl.Int32), pl.col("col").cast(pl.Int32), pl.col("val").cast(pl.Float32)
+            ))
+            buffer_bytes += chunk.estimated_size()
+            if buffer_bytes >= memory_budget:
+                flush()
+        flush()
+
+        # ---------------------------------------------------
+        # Pass 2: k-way merge into one sorted, unique file
+        # ---------------------------------------------------
+        print(f"Merging {len(runs)} runs")
+        writer = pq.ParquetWriter(output_path, SCHEMA)
+        row_counts = np.zeros(n_rows, dtype=np.int64)
+        rg_offsets, rg_min, rg_max = [], [], []
+        pending, pending_rows, total, dropped = [], 0, 0, 0
+
+        def write_group(df):
+            nonlocal total
+            rows = df["row"].to_numpy()
+            writer.write_table(df.to_arrow().cast(SCHEMA), row_group_size=df.height)
+            row_counts[:] += np.bincount(rows, minlength=n_rows)
+            rg_offsets.append(total)
+            rg_min.append(int(rows[0]))
+            rg_max.append(int(rows[-1]))
+            total += df.height
+
+        for merged in merge_runs(runs, n_cols):
+            if drop_zeros:
+                before = merged.height
+                merged = merged.filter(pl.col("val") != 0)
+                dropped += before - merged.height
+            pending.append(merged)
+            pending_rows += merged.height
+            if pending_rows >= row_group_size:
+                df = pl.concat(pending)
+                full = (pending_rows // row_group_size) * row_group_size
+                for lo in range(0, full, row_group_size):
+                    write_group(df.slice(lo, row_group_size))
+                pending, pending_rows = [df.slice(full)], pending_rows - full
+        if pending_rows:
+            write_group(pl.concat(pending))
+        writer.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    save_coo_index(output_path, "row", row_counts, rg_offsets + [total], rg_min, rg_max)
+    msg = f", {dropped} zero sums dropped" if drop_zeros else ""
+    print(f"Done. Wrote {output_path}: {total} unique entries from {meta.num_rows} "
+          f"({meta.num_rows - total - dropped} duplicates merged{msg}) and {index_path(output_path)}")
+    return total
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sum duplicate (row, col) entries of COO Parquet out of core")
+    parser.add_argument("input_path", help="Input COO Parquet (may contain duplicates)")
+    parser.add_argument("output_path", help="Output COO Parquet, sorted by (row, col) and unique")
+    parser.add_argument("--chunk", type=int, default=1_000_000, help="Rows per input chunk")
+    parser.add_argument("--mem_mb", type=int, default=1024, help="Memory budget per sorted run (MB)")
+    parser.add_argument("--row_group_size", type=int, default=1_000_000, help="Rows per output row group")
+    parser.add_argument("--batch_rows", type=int, default=65536, help="Rows per run batch read during the merge")
+    parser.add_argument("--drop_zeros", action="store_true", help="Drop entries whose duplicates sum to 0")
+    parser.add_argument("--tmp_dir", default=None, help="Directory for sorted runs (default: next to output)")
+    args = parser.parse_args()
+
+    coalesce_coo_parquet(args.input_path, args.output_path, chunk_size=args.chunk,
+                         memory_budget=args.mem_mb * 1024 * 1024, row_group_size=args.row_group_size,
+                         batch_rows=args.batch_rows, drop_zeros=args.drop_zeros, tmp_dir=args.tmp_dir)
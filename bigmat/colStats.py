@@ -0,0 +1,229 @@
+# python3 colStats.py A.parquet                 (compute or reuse the sidecar, print a summary)
+# python3 colStats.py A_coo.parquet --refresh   (recompute even if the sidecar is valid)
+# python3 colStats.py C_dir                     (part-file dataset: one sidecar per part, merged)
+
+import hashlib
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import argparse
+import os
+import struct
+
+from parquetChunks import dataset_files, iter_parquet_chunks
+
+
+def stats_path(path):
+    """Sidecar file holding the column statistics of a matrix file."""
+    return path + ".stats.npz"
+
+
+def file_key(path):
+    """
+    Identity of a Parquet file: size, mtime and a hash of its footer.
+    A sidecar is valid only while all three match.
+    """
+    st = os.stat(path)
+    with open(path, "rb") as f:
+        f.seek(-8, os.SEEK_END)
+        footer_len = struct.unpack("<I", f.read(4))[0]
+        f.seek(-8 - footer_len, os.SEEK_END)
+        footer = hashlib.sha1(f.read(footer_len)).hexdigest()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "footer": footer}
+
+
+def is_coo(path):
+    return {"row", "col", "val"}.issubset(pq.read_schema(path).names)
+
+
+# ----------------------------
+# Mergeable statistics
+# ----------------------------
+def dense_block_stats(X):
+    """
+    Statistics of a dense (rows x cols) block: count/nnz/sum/sumsq/min/max
+    per column over the non-NaN values, the NaN count, and M2 (sum of
+    squared deviations) for a stable variance.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    nan = np.isnan(X)
+    Xz = np.where(nan, 0.0, X)
+    count = X.shape[0] - nan.sum(axis=0)
+    total = Xz.sum(axis=0)
+    mean = total / np.maximum(count, 1)
+    return {
+        "kind": "dense",
+        "count": count.astype(np.int64),
+        "nnz": np.count_nonzero(Xz, axis=0).astype(np.int64),
+        "sum": total,
+        "sumsq": (Xz * Xz).sum(axis=0),
+        "min": np.where(nan, np.inf, X).min(axis=0, initial=np.inf),
+        "max": np.where(nan, -np.inf, X).max(axis=0, initial=-np.inf),
+        "nan": nan.sum(axis=0).astype(np.int64),
+        "m2": (np.where(nan, 0.0, X - mean) ** 2).sum(axis=0),
+    }
+
+
+def pad_stats(s, n_cols):
+    """Extend per-column arrays to n_cols columns (empty columns)."""
+    extra = n_cols - len(s["count"])
+    if extra <= 0:
+        return s
+    fill = {"count": 0, "nnz": 0, "sum": 0.0, "sumsq": 0.0, "min": np.inf, "max": -np.inf, "nan": 0, "m2": 0.0}
+    return s | {k: np.concatenate((s[k], np.full(extra, fill[k], dtype=s[k].dtype)))
+                for k in fill if k in s}
+
+
+def merge_stats(a, b):
+    """Merge the statistics of two row-disjoint pieces of the same matrix."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    n_cols = max(len(a["count"]), len(b["count"]))
+    a, b = pad_stats(a, n_cols), pad_stats(b, n_cols)
+    out = {
+        "kind": a["kind"],
+        "count": a["count"] + b["count"],
+        "nnz": a["nnz"] + b["nnz"],
+        "sum": a["sum"] + b["sum"],
+        "sumsq": a["sumsq"] + b["sumsq"],
+        "min": np.minimum(a["min"], b["min"]),
+        "max": np.maximum(a["max"], b["max"]),
+    }
+    if "nan" in a and "nan" in b:
+        out["nan"] = a["nan"] + b["nan"]
+    if "m2" in a and "m2" in b:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_a = np.where(a["count"] > 0, a["sum"] / np.maximum(a["count"], 1), 0.0)
+            mean_b = np.where(b["count"] > 0, b["sum"] / np.maximum(b["count"], 1), 0.0)
+            n = np.maximum(out["count"], 1)
+            out["m2"] = a["m2"] + b["m2"] + (mean_b - mean_a) ** 2 * (a["count"] * b["count"] / n)
+    return out
+
+
+# ----------------------------
+# Computing
+# ----------------------------
+def compute_dense_stats(path, batch_rows=65536):
+    """One streaming pass over the row batches of a dense Parquet matrix."""
+    from matmul import table_to_fortran  # matmul imports mmapMx; keep this module light
+
+    pf = pq.ParquetFile(path)
+    stats = dense_block_stats(np.zeros((0, len(pf.schema_arrow.names))))
+    for batch in pf.iter_batches(batch_size=batch_rows):
+        stats = merge_stats(stats, dense_block_stats(table_to_fortran(pa.Table.from_batches([batch]))))
+    return stats
+
+
+def coo_chunk_stats(cols, vals, n_cols=None):
+    """
+    Statistics of the stored entries of a COO chunk, reduced into dense
+    per-column arrays with np.bincount (count = stored non-NaN entries).
+    """
+    cols = np.asarray(cols, dtype=np.int64)
+    vals = np.asarray(vals, dtype=np.float64)
+    n_cols = n_cols or (int(cols.max()) + 1 if len(cols) else 0)
+    nan = np.isnan(vals)
+    nan_count = np.bincount(cols[nan], minlength=n_cols).astype(np.int64)
+    if nan.any():
+        cols, vals = cols[~nan], vals[~nan]
+    vmin = np.full(n_cols, np.inf)
+    vmax = np.full(n_cols, -np.inf)
+    np.minimum.at(vmin, cols, vals)
+    np.maximum.at(vmax, cols, vals)
+    return {
+        "kind": "coo",
+        "count": np.bincount(cols, minlength=n_cols).astype(np.int64),
+        "nnz": np.bincount(cols, weights=vals != 0, minlength=n_cols).astype(np.int64),
+        "sum": np.bincount(cols, weights=vals, minlength=n_cols),
+        "sumsq": np.bincount(cols, weights=vals * vals, minlength=n_cols),
+        "min": vmin,
+        "max": vmax,
+        "nan": nan_count,
+    }
+
+
+def compute_coo_stats(path, chunk_size=1_000_000):
+    """
+    Per-column statistics of the stored entries of a COO Parquet file,
+    streamed over row groups; memory is O(ncols + one chunk).
+    """
+    stats = coo_chunk_stats(np.zeros(0), np.zeros(0))
+    for _, chunk in iter_parquet_chunks(path, chunk_size, columns=["col", "val"]):
+        stats = merge_stats(stats, coo_chunk_stats(chunk["col"].to_numpy(), chunk["val"].to_numpy()))
+    return stats
+
+
+# ----------------------------
+# Sidecar cache
+# ----------------------------
+def save_stats(path, stats):
+    """Write the sidecar of path, keyed by its current size/mtime/footer hash."""
+    key = file_key(path)
+    np.savez(stats_path(path), size=key["size"], mtime_ns=key["mtime_ns"], footer=np.array(key["footer"]),
+             **{k: v for k, v in stats.items() if k != "kind"}, kind=np.array(stats["kind"]))
+
+
+def load_stats(path):
+    """The cached statistics of path, or None if there is no valid sidecar."""
+    sp = stats_path(path)
+    if not os.path.exists(sp):
+        return None
+    key = file_key(path)
+    with np.load(sp) as z:
+        if (int(z["size"]) != key["size"] or int(z["mtime_ns"]) != key["mtime_ns"]
+                or str(z["footer"]) != key["footer"]):
+            return None
+        stats = {k: z[k] for k in z.files if k not in ("size", "mtime_ns", "footer", "kind")}
+        stats["kind"] = str(z["kind"])
+    return stats
+
+
+def column_stats(path, refresh=False, batch_rows=65536):
+    """
+    Column statistics of a dense or COO Parquet file, from its sidecar when
+    valid, otherwise computed in one pass and cached. For a part-file
+    dataset directory every part has its own sidecar and the results are
+    merged, so appending a part only costs a pass over the new part.
+    """
+    stats = None
+    for part in dataset_files(path):
+        s = None if refresh else load_stats(part)
+        if s is None:
+            print(f"Computing column statistics: {part}")
+            s = compute_coo_stats(part) if is_coo(part) else compute_dense_stats(part, batch_rows)
+            save_stats(part, s)
+        stats = merge_stats(stats, s)
+    return stats
+
+
+def mean_std(stats, total_rows=None, ddof=0):
+    """
+    Per-column mean and std from column statistics. total_rows counts the
+    implicit zeros of a COO matrix (default: the stored count).
+    Dense statistics use M2 when total_rows is not given.
+    """
+    n = stats["count"].astype(np.float64) if total_rows is None else float(total_rows)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = stats["sum"] / n
+        if "m2" in stats and total_rows is None:
+            var = stats["m2"] / (n - ddof)
+        else:
+            var = (stats["sumsq"] - n * mean ** 2) / (n - ddof)
+    return mean, np.sqrt(np.clip(var, 0.0, None))
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute or reuse the column-statistics sidecar of a matrix")
+    parser.add_argument("path", help="Dense or COO Parquet file, or part-file dataset directory")
+    parser.add_argument("--refresh", action="store_true", help="Recompute even if the sidecar is valid")
+    args = parser.parse_args()
+
+    stats = column_stats(args.path, refresh=args.refresh)
+    print(f"{stats['kind']} matrix, {len(stats['count'])} columns, {int(stats['count'].sum())} values, "
+          f"{int(stats['nnz'].sum())} nonzeros")
+    print(f"min={stats['min'].min():.6g}, max={stats['max'].max():.6g}")
@@ -0,0 +1,152 @@
+# python3 csrMx.py to_csr A_coo.parquet A.csr            (COO Parquet -> CSR store)
+# python3 csrMx.py to_csr A_coo.parquet A.csc --csc      (COO Parquet -> CSC store)
+# python3 csrMx.py to_coo A.csr A_coo.parquet            (CSR/CSC store -> COO Parquet)
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import argparse
+import json
+import os
+import shutil
+import tempfile
+
+from parquetChunks import iter_parquet_chunks, column_max
+from sortCOO import sort_coo_parquet, load_coo_index
+
+
+def coo_to_csr(coo_path, store_dir, csc=False, chunk_size=1_000_000, memory_budget=1 << 30, tmp_dir=None):
+    """
+    Convert COO Parquet to a compressed sparse store: a directory with
+    indptr.npy (int64), indices.npy (int32), data.npy (float32) and meta.json.
+    CSR compresses rows (indices are columns); CSC compresses columns.
+    The input is streamed in key order; if it has no sortCOO index on the
+    right key that matches the file as it is now (size, mtime and footer
+    hash, see colStats.file_key), it is sorted out of core first. The arrays are written as memory maps,
+    so memory use is one chunk plus the indptr.
+    """
+    key, other = ("col", "row") if csc else ("row", "col")
+    fmt = "csc" if csc else "csr"
+
+    meta = pq.read_metadata(coo_path)
+    maxes = {name: column_max(coo_path, name, chunk_size) for name in ("row", "col")}
+    shape = (maxes["row"] + 1, maxes["col"] + 1)
+    nnz = meta.num_rows
+    n_keys = shape[1] if csc else shape[0]
+
+    work_dir = None
+    index = load_coo_index(coo_path)
+    if index is None or index["key"] != key or int(index["indptr"][-1]) != nnz:
+        work_dir = tempfile.mkdtemp(prefix="csr_", dir=tmp_dir or os.path.dirname(os.path.abspath(store_dir)))
+        sorted_path = os.path.join(work_dir, "sorted.parquet")
+        sort_coo_parquet(coo_path, sorted_path, by=key, chunk_size=chunk_size,
+                         memory_budget=memory_budget, tmp_dir=work_dir)
+        coo_path = sorted_path
+
+    if os.path.isdir(store_dir):
+        shutil.rmtree(store_dir)
+    os.makedirs(store_dir)
+    print(f"Converting to {fmt.upper()}: {store_dir} ({shape[0]}x{shape[1]}, {nnz} nonzeros)")
+
+    try:
+        indices = np.lib.format.open_memmap(os.path.join(store_dir, "indices.npy"), mode="w+", dtype=np.int32, shape=(nnz,))
+        data = np.lib.format.open_memmap(os.path.join(store_dir, "data.npy"), mode="w+", dtype=np.float32, shape=(nnz,))
+        counts = np.zeros(n_keys, dtype=np.int64)
+
+        for offset, chunk in iter_parquet_chunks(coo_path, chunk_size, columns=["row", "col", "val"]):
+            n = chunk.height
+            indices[offset:offset + n] = chunk[other].to_numpy()
+            data[offset:offset + n] = chunk["val"].to_numpy()
+            counts += np.bincount(chunk[key].to_numpy(), minlength=n_keys)
+        indices.flush()
+        data.flush()
+        del indices, data
+
+        np.save(os.path.join(store_dir, "indptr.npy"), np.concatenate(([0], np.cumsum(counts))))
+    finally:
+        if work_dir is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    with open(os.path.join(store_dir, "meta.json"), "w") as f:
+        json.dump({"format": fmt, "shape": list(shape), "nnz": int(nnz)}, f)
+    print(f"Done: {store_dir}")
+
+
+def open_csr(store_dir):
+    """
+    Open a CSR/CSC store. Returns (meta, indptr, indices, data); the arrays
+    are read-only memory maps.
+    """
+    with open(os.path.join(store_dir, "meta.json")) as f:
+        meta = json.load(f)
+    arrays = [np.load(os.path.join(store_dir, f"{name}.npy"), mmap_mode="r") for name in ("indptr", "indices", "data")]
+    return (meta, *arrays)
+
+
+def is_csr_store(path):
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, "meta.json")) \
+        and os.path.exists(os.path.join(path, "indptr.npy"))
+
+
+def iter_csr_blocks(store_dir, block_rows=65536):
+    """
+    Yield (row_start, indptr, indices, data) for blocks of block_rows
+    compressed rows (columns for CSC). indptr is rebased to start at 0 and
+    indices/data are memory-mapped views.
+    """
+    _, indptr, indices, data = open_csr(store_dir)
+    n = len(indptr) - 1
+    for start in range(0, n, block_rows):
+        end = min(start + block_rows, n)
+        lo, hi = int(indptr[start]), int(indptr[end])
+        yield start, np.asarray(indptr[start:end + 1]) - lo, indices[lo:hi], data[lo:hi]
+
+
+def csr_to_coo(store_dir, coo_path, block_rows=65536):
+    """Write a CSR/CSC store back to COO Parquet (row, col, val), one block per row group."""
+    meta, _, _, _ = open_csr(store_dir)
+    csc = meta["format"] == "csc"
+    if os.path.exists(coo_path):
+        os.remove(coo_path)
+
+    schema = pa.schema([("row", pa.int32()), ("col", pa.int32()), ("val", pa.float32())])
+    writer = pq.ParquetWriter(coo_path, schema)
+    for start, indptr, indices, data in iter_csr_blocks(store_dir, block_rows):
+        keys = np.repeat(np.arange(start, start + len(indptr) - 1, dtype=np.int32), np.diff(indptr))
+        rows, cols = (indices, keys) if csc else (keys, indices)
+        writer.write_table(pa.table({
+            "row": pa.array(np.asarray(rows, dtype=np.int32)),
+            "col": pa.array(np.asarray(cols, dtype=np.int32)),
+            "val": pa.array(np.asarray(data)),
+        }, schema=schema))
+    writer.close()
+    print(f"Done: {coo_path} ({meta['nnz']} nonzeros)")
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert between COO Parquet and CSR/CSC stores")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_to = sub.add_parser("to_csr", help="COO Parquet -> CSR (or CSC) store")
+    p_to.add_argument("coo_path", help="Input COO Parquet")
+    p_to.add_argument("store_dir", help="Output store directory")
+    p_to.add_argument("--csc", action="store_true", help="Compress columns instead of rows")
+    p_to.add_argument("--chunk", type=int, default=1_000_000, help="Rows per input chunk")
+    p_to.add_argument("--mem_mb", type=int, default=1024, help="Memory budget for sorting unsorted input (MB)")
+    p_to.add_argument("--tmp_dir", default=None, help="Directory for sort runs (default: next to output)")
+
+    p_from = sub.add_parser("to_coo", help="CSR/CSC store -> COO Parquet")
+    p_from.add_argument("store_dir", help="Input store directory")
+    p_from.add_argument("coo_path", help="Output COO Parquet")
+    p_from.add_argument("--block_rows", type=int, default=65536, help="Compressed rows per output row group")
+
+    args = parser.parse_args()
+
+    if args.cmd == "to_csr":
+        coo_to_csr(args.coo_path, args.store_dir, csc=args.csc, chunk_size=args.chunk,
+                   memory_budget=args.mem_mb * 1024 * 1024, tmp_dir=args.tmp_dir)
+    else:
+        csr_to_coo(args.store_dir, args.coo_path, block_rows=args.block_rows)
@@ -0,0 +1,211 @@
+# python3 genCOO.py A_coo.parquet --nrows 1000000 --ncols 1000000 --nnz 100000000 --seed 1
+# python3 genCOO.py A_coo.parquet --nrows 1000000 --ncols 1000000 --nnz 100000000 --dist powerlaw --alpha 1.2 --workers 16
+# python3 genCOO.py A_coo.arrow --nrows 100000 --ncols 100000 --nnz 10000000 --diag_blocks 100      (block-diagonal, IPC)
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+import argparse
+import itertools
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from sortCOO import save_coo_index, load_coo_index, index_path, read_key_range, key_nnz
+
+SCHEMA = pa.schema([("row", pa.int32()), ("col", pa.int32()), ("val", pa.float32())])
+
+
+def column_ranges(nrows, ncols, diag_blocks=1):
+    """Allowed column range [lo, hi) of every row (the whole row unless block-diagonal)."""
+    g = np.arange(nrows, dtype=np.int64) * diag_blocks // nrows
+    return g * ncols // diag_blocks, (g + 1) * ncols // diag_blocks
+
+
+def row_degrees(nrows, nnz, caps, dist="uniform", alpha=1.0, seed=0):
+    """
+    Nonzeros per row, summing to exactly nnz and never above caps.
+    dist="uniform" spreads them evenly; dist="powerlaw" gives row i (in a
+    random order) weight (rank)^-alpha.
+    """
+    if nnz > caps.sum():
+        raise ValueError(f"nnz={nnz} exceeds the {int(caps.sum())} available positions")
+    rng = np.random.default_rng([seed, 0])
+    if dist == "powerlaw":
+        w = rng.permutation(np.arange(1, nrows + 1, dtype=np.float64) ** -alpha)
+    else:
+        w = np.ones(nrows)
+    deg = np.minimum(np.floor(nnz * w / w.sum()).astype(np.int64), caps)
+    rest = nnz - int(deg.sum())
+    while rest > 0:
+        open_rows = np.flatnonzero(deg < caps)
+        p = w[open_rows] / w[open_rows].sum()
+        take = rng.choice(open_rows, size=min(rest, len(open_rows)), replace=False, p=p)
+        deg[take] += 1
+        rest -= len(take)
+    return deg
+
+
+def sample_block(row0, deg, lo, hi, seed, block_id, values="uniform"):
+    """
+    Sorted, duplicate-free (row, col, val) arrays for rows row0.. with deg[i]
+    nonzeros drawn from columns [lo[i], hi[i]). The block has its own seeded
+    generator, so its output does not depend on which worker makes it.
+    Columns are drawn with replacement and deduplicated until every row is
+    full; rows denser than half their range are drawn without replacement.
+    """
+    rng = np.random.default_rng([seed, 1, block_id])
+    width = hi - lo
+    rows_local = np.arange(len(deg), dtype=np.int64)
+    dense = deg * 2 > width
+
+    keys = np.empty(0, dtype=np.int64)
+    n_cols_total = int(hi.max()) if len(hi) else 0
+    need = np.where(dense, 0, deg)
+    while need.any():
+        r = np.repeat(rows_local, need)
+        c = lo[r] + (rng.random(len(r)) * width[r]).astype(np.int64)
+        keys = np.sort(np.concatenate((keys, r * n_cols_total + c)))
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+        need = np.where(dense, 0, deg - np.bincount(keys // n_cols_total, minlength=len(deg)))
+
+    extra = [i * n_cols_total + lo[i] + rng.choice(width[i], deg[i], replace=False) for i in np.flatnonzero(dense)]
+    if extra:
+        keys = np.sort(np.concatenate([keys] + extra))
+
+    if values == "normal":
+        val = rng.standard_normal(len(keys)).astype(np.float32)
+    else:
+        val = np.round(rng.uniform(1, 10, len(keys)), 2).astype(np.float32)
+    return (
+        (row0 + keys // n_cols_total).astype(np.int32),
+        (keys % n_cols_total).astype(np.int32),
+        val,
+    )
+
+
+def generate_block(args):
+    row0, deg, lo, hi, seed, block_id, values = args
+    return sample_block(row0, deg, lo, hi, seed, block_id, values)
+
+
+def generate_coo(path, nrows, ncols, nnz, dist="uniform", alpha=1.0, diag_blocks=1, block_rows=100_000,
+                 values="uniform", seed=0, workers=1, check=False):
+    """
+    Generate an nrows x ncols COO matrix with exactly nnz nonzeros and no
+    duplicate positions, sorted by (row, col), straight into typed Parquet
+    (or Arrow IPC for .arrow/.ipc/.feather paths).
+    Rows are drawn in blocks of block_rows, one row group / record batch per
+    block; with workers > 1 blocks are drawn in a process pool and written in
+    order. Output is identical for any worker count. Parquet output gets a
+    sortCOO row index, checked against the file (check=True also reads every
+    block back through read_key_range).
+    """
+    if os.path.exists(path):
+        os.remove(path)
+
+    lo, hi = column_ranges(nrows, ncols, diag_blocks)
+    deg = row_degrees(nrows, nnz, hi - lo, dist, alpha, seed)
+    n_blocks = (nrows + block_rows - 1) // block_rows
+    print(f"Generating COO {path}: {nrows}x{ncols}, nnz={nnz} ({dist}"
+          f"{f', alpha={alpha}' if dist == 'powerlaw' else ''}"
+          f"{f', {diag_blocks} diagonal blocks' if diag_blocks > 1 else ''}), "
+          f"{n_blocks} blocks of {block_rows} rows, max row degree {int(deg.max())}")
+
+    tasks = (
+        (b * block_rows, deg[b * block_rows:(b + 1) * block_rows],
+         lo[b * block_rows:(b + 1) * block_rows], hi[b * block_rows:(b + 1) * block_rows], seed, b, values)
+        for b in range(n_blocks)
+    )
+
+    ipc_out = path.endswith((".arrow", ".ipc", ".feather"))
+    writer = ipc.new_file(path, SCHEMA) if ipc_out else pq.ParquetWriter(path, SCHEMA)
+    rg_offsets, rg_min, rg_max, total = [], [], [], 0
+
+    def blocks():
+        if workers <= 1:
+            yield from map(generate_block, tasks)
+            return
+        # keep a bounded window of blocks in flight
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            window = deque(pool.submit(generate_block, t) for t in itertools.islice(tasks, 2 * workers))
+            while window:
+                result = window.popleft().result()
+                nxt = next(tasks, None)
+                if nxt is not None:
+                    window.append(pool.submit(generate_block, nxt))
+                yield result
+
+    for b, (row, col, val) in enumerate(blocks()):
+        table = pa.table({"row": row, "col": col, "val": val}, schema=SCHEMA)
+        if ipc_out:
+            writer.write_table(table)
+        elif table.num_rows:
+            # no empty row groups: index row group i must be file row group i
+            writer.write_table(table, row_group_size=table.num_rows)
+            rg_offsets.append(total)
+            rg_min.append(int(row[0]))
+            rg_max.append(int(row[-1]))
+        total += table.num_rows
+        print(f"  Block {b}: rows {b * block_rows} -> {min((b + 1) * block_rows, nrows)}, {table.num_rows} nonzeros")
+    writer.close()
+
+    if not ipc_out:
+        save_coo_index(path, "row", deg, rg_offsets + [total], rg_min, rg_max)
+        check_coo_index(path, block_rows, full=check)
+        print(f"Done: {path} ({total} nonzeros) and {index_path(path)}")
+    else:
+        print(f"Done: {path} ({total} nonzeros)")
+
+
+def check_coo_index(path, block_rows=100_000, full=False):
+    """
+    Check that the sortCOO index of path matches the file: one index entry
+    per row group with the same offsets. With full=True every block of
+    block_rows rows is also read back with read_key_range and compared with
+    the index counts. Raises ValueError on a mismatch.
+    """
+    index = load_coo_index(path)
+    meta = pq.read_metadata(path)
+    sizes = [meta.row_group(g).num_rows for g in range(meta.num_row_groups)]
+    if not np.array_equal(np.diff(index["rg_offsets"]), sizes):
+        raise ValueError(f"{index_path(path)} does not match the row groups of {path}")
+    if full:
+        n_rows = len(index["indptr"]) - 1
+        for lo in range(0, n_rows, block_rows):
+            got = read_key_range(path, lo, lo + block_rows, index).height
+            if got != key_nnz(index, lo, lo + block_rows):
+                raise ValueError(f"rows {lo}..{lo + block_rows}: read {got} entries, "
+                                 f"index has {key_nnz(index, lo, lo + block_rows)}")
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic sparse COO matrix (exact nnz, no duplicates)")
+    parser.add_argument("path", help="Output .parquet (or .arrow/.ipc/.feather for Arrow IPC)")
+    parser.add_argument("--nrows", type=int, required=True, help="Number of rows")
+    parser.add_argument("--ncols", type=int, required=True, help="Number of columns")
+    parser.add_argument("--nnz", type=int, default=None, help="Exact number of nonzeros")
+    parser.add_argument("--density", type=float, default=None, help="Alternative to --nnz: fraction of nonzeros")
+    parser.add_argument("--dist", choices=["uniform", "powerlaw"], default="uniform", help="Row degree distribution")
+    parser.add_argument("--alpha", type=float, default=1.0, help="Power-law exponent of row degrees")
+    parser.add_argument("--diag_blocks", type=int, default=1, help="Block-diagonal structure with this many blocks")
+    parser.add_argument("--values", choices=["uniform", "normal"], default="uniform",
+                        help="uniform: U(1, 10) rounded to 0.01 (like genCOO0/1); normal: N(0, 1)")
+    parser.add_argument("--block_rows", type=int, default=100_000, help="Rows per generated block / row group")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--workers", type=int, default=1, help="Processes generating blocks")
+    parser.add_argument("--check", action="store_true", help="Read every block back through the sort index")
+    args = parser.parse_args()
+
+    if (args.nnz is None) == (args.density is None):
+        parser.error("give exactly one of --nnz and --density")
+    nnz = args.nnz if args.nnz is not None else int(round(args.density * args.nrows * args.ncols))
+
+    generate_coo(args.path, args.nrows, args.ncols, nnz, dist=args.dist, alpha=args.alpha,
+                 diag_blocks=args.diag_blocks, block_rows=args.block_rows, values=args.values,
+                 seed=args.seed, workers=args.workers, check=args.check)
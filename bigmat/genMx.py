@@ -1,9 +1,43 @@
 import os
+import itertools
+import multiprocessing
 import numpy as np
 import polars as pl
 import pyarrow as pa
 import pyarrow.parquet as pq
 import pyarrow.ipc as ipc
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+def random_fortran(n_rows, n_cols, rng=None):
+    """
+    Uniform [0, 1) float32 block in column-major order: each column is
+    contiguous, so Arrow arrays wrap the columns without copying.
+    """
+    rng = rng or np.random.default_rng()
+    return rng.random((n_cols, n_rows), dtype=np.float32).T
+
+
+def tile_rng(seed, bi, bj=0):
+    """Generator of tile (bi, bj): any tile can be regenerated on its own from the seed."""
+    return np.random.default_rng([seed, bi, bj])
+
+
+def fortran_table(data, col_start=0):
+    """Arrow table over the (contiguous) columns of a column-major block, named col{i}."""
+    return pa.Table.from_arrays(
+        [pa.array(data[:, j]) for j in range(data.shape[1])],
+        names=[f'col{col_start + j}' for j in range(data.shape[1])]
+    )
+
+
+def resolve_seed(seed):
+    """A fixed seed, or a fresh one (printed, so the run can be repeated)."""
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % (1 << 63))
+        print(f"Seed: {seed}")
+    return seed
 
 
 def generate_dummy_csv(path, rows, cols):
@@ -22,14 +56,8 @@ def generate_dummy_csv(path, rows, cols):
 def generate_dummy_parquet(path, rows, cols):
     print(f'Generating Parquet with PyArrow: {path} ({rows}x{cols})')
 
-    # Generate random NumPy array
-    data = np.random.rand(rows, cols).astype(np.float32)
-
-    # Convert each column to Arrow array
-    arrays = [pa.array(data[:, i], type=pa.float32()) for i in range(cols)]
-
-    # Create Arrow Table
-    table = pa.Table.from_arrays(arrays, names=[f'col{i}' for i in range(cols)])
+    # Generate random column-major array and wrap its columns
+    table = fortran_table(random_fortran(rows, cols))
 
     # Write Parquet (compressed, very fast)
     pq.write_table(table, path, compression='snappy')
@@ -38,37 +66,56 @@ def generate_dummy_parquet(path, rows, cols):
 
 
 
-def generate_parquet_row_chunked(path, rows, cols, row_chunk=10000):
+def row_chunk_task(args):
+    seed, bi, n_rows, cols = args
+    return random_fortran(n_rows, cols, tile_rng(seed, bi))
+
+
+def generate_parquet_row_chunked(path, rows, cols, row_chunk=10000, seed=None, workers=1):
     """
     Generate a huge Parquet file by chunking over rows.
     Best when rows are huge but columns are reasonable.
+    Row chunk bi comes from its own seeded generator and becomes one row
+    group; with workers > 1 chunks are drawn in a process pool and written
+    in order, so the file is identical for any worker count.
     """
     print(f"Generating Parquet (row-chunked): {path} ({rows} x {cols})")
+    seed = resolve_seed(seed)
 
     # Remove existing file
     if os.path.exists(path):
         os.remove(path)
 
-    writer = None
-
-    for start in range(0, rows, row_chunk):
-        end = min(rows, start + row_chunk)
-        n_rows = end - start
+    tasks = ((seed, bi, min(rows, start + row_chunk) - start, cols)
+             for bi, start in enumerate(range(0, rows, row_chunk)))
+
+    def chunks():
+        if workers <= 1:
+            yield from map(row_chunk_task, tasks)
+            return
+        # keep a bounded window of chunks in flight
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            window = deque(pool.submit(row_chunk_task, t) for t in itertools.islice(tasks, 2 * workers))
+            while window:
+                data_chunk = window.popleft().result()
+                nxt = next(tasks, None)
+                if nxt is not None:
+                    window.append(pool.submit(row_chunk_task, nxt))
+                yield data_chunk
 
-        print(f"Generating rows {start}–{end}")
-
-        # Generate only row chunk
-        data_chunk = np.random.rand(n_rows, cols).astype(np.float32)
+    writer = None
+    start = 0
 
-        # Convert to Arrow Table
-        arrays = [pa.array(data_chunk[:, i], type=pa.float32()) for i in range(cols)]
-        table = pa.Table.from_arrays(arrays, names=[f'col{i}' for i in range(cols)])
+    for data_chunk in chunks():
+        print(f"Generating rows {start}–{start + data_chunk.shape[0]}")
+        table = fortran_table(data_chunk)
 
         # Initialize Parquet writer
         if writer is None:
             writer = pq.ParquetWriter(path, table.schema, compression="snappy")
 
         writer.write_table(table)
+        start += data_chunk.shape[0]
 
     if writer:
         writer.close()
@@ -95,15 +142,8 @@ def generate_parquet_col_chunked(path, rows, cols, col_chunk=2000):
 
         print(f"Generating cols {start_col}–{end_col}")
 
-        # Generate only this column chunk
-        data_chunk = np.random.rand(rows, n_cols).astype(np.float32)
-
-        # Convert to Arrow Table
-        arrays = [pa.array(data_chunk[:, i], type=pa.float32()) for i in range(n_cols)]
-        table = pa.Table.from_arrays(
-            arrays,
-            names=[f'col{c}' for c in range(start_col, end_col)]
-        )
+        # Generate only this column chunk (column-major, wrapped without copies)
+        table = fortran_table(random_fortran(rows, n_cols), start_col)
 
         # Initialize Parquet writer
         if writer is None:
@@ -117,45 +157,50 @@ def generate_parquet_col_chunked(path, rows, cols, col_chunk=2000):
     print("Done (col-chunked).")
 
 
+def tile_task(args):
+    """Generate and write tile (bi, bj); runs in a worker process."""
+    out_dir, seed, bi, bj, row_start, row_end, col_start, col_end = args
+    data = random_fortran(row_end - row_start, col_end - col_start, tile_rng(seed, bi, bj))
+    out_file = f"{out_dir}/tile_{bi:04d}_{bj:04d}.parquet"
+    pq.write_table(fortran_table(data, col_start), out_file, compression='zstd')
+    return out_file
+
+
 def generate_parquet_2d_tiled(out_dir, rows, cols,
-                              row_block=5000, col_block=5000):
+                              row_block=5000, col_block=5000, seed=None, workers=1):
     """
     Generate a huge matrix in 2D tiles (row_block × col_block) Parquet files.
     Safe when both rows and cols are very large.
+    Each tile has its own seed derived from (seed, bi, bj), so any tile can
+    be regenerated independently; with workers > 1 tiles are generated and
+    written by a process pool.
     """
     os.makedirs(out_dir, exist_ok=True)
 
     print(f"Generating HUGE matrix: {rows} x {cols}")
     print(f"Block size: {row_block} x {col_block}")
+    seed = resolve_seed(seed)
 
     n_row_blocks = (rows + row_block - 1) // row_block
     n_col_blocks = (cols + col_block - 1) // col_block
 
-    for bi in range(n_row_blocks):
-        row_start = bi * row_block
-        row_end = min(rows, row_start + row_block)
-        n_r = row_end - row_start
-
-        for bj in range(n_col_blocks):
-            col_start = bj * col_block
-            col_end = min(cols, col_start + col_block)
-            n_c = col_end - col_start
-
-            print(f"Generating block ({bi}, {bj}) → rows {row_start}-{row_end}, cols {col_start}-{col_end}")
+    tasks = [
+        (out_dir, seed, bi, bj,
+         bi * row_block, min(rows, (bi + 1) * row_block),
+         bj * col_block, min(cols, (bj + 1) * col_block))
+        for bi in range(n_row_blocks) for bj in range(n_col_blocks)
+    ]
 
-            # Create 2D tile (small enough)
-            data_chunk = np.random.rand(n_r, n_c).astype('float32')
+    def report(results):
+        for t, out_file in zip(tasks, results):
+            _, _, bi, bj, row_start, row_end, col_start, col_end = t
+            print(f"Generated block ({bi}, {bj}) → rows {row_start}-{row_end}, cols {col_start}-{col_end}: {out_file}")
 
-            # Convert to Arrow table
-            arrays = [pa.array(data_chunk[:, j]) for j in range(n_c)]
-            table = pa.Table.from_arrays(
-                arrays,
-                names=[f'col{col_start + j}' for j in range(n_c)]
-            )
-
-            # Save as block file
-            out_file = f"{out_dir}/tile_{bi:04d}_{bj:04d}.parquet"
-            pq.write_table(table, out_file, compression='zstd')
+    if workers <= 1:
+        report(map(tile_task, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            report(pool.map(tile_task, tasks))
 
     print("✓ DONE: 2D tiled matrix generated.")
 
@@ -164,9 +209,7 @@ def generate_parquet_2d_tiled(out_dir, rows, cols,
 def generate_dummy_arrowIPC(path, rows, cols, compression='lz4'):
     print(f'Generating Arrow IPC: {path} ({rows}x{cols})')
 
-    data = np.random.rand(rows, cols).astype(np.float32)
-    arrays = [pa.array(data[:, i], type=pa.float32()) for i in range(cols)]
-    table = pa.Table.from_arrays(arrays, names=[f'col{i}' for i in range(cols)])
+    table = fortran_table(random_fortran(rows, cols))
 
     dir_name = os.path.dirname(path)
     if dir_name:
@@ -197,6 +240,10 @@ if __name__ == '__main__':
     # generate_parquet_2d_tiled('B_tiles', rows=15000, cols=20000,
     #                           row_block=5000, col_block=5000)
 
+    # generate_parquet_2d_tiled('A_tiles', rows=100000, cols=100000,
+    #                           row_block=5000, col_block=5000, seed=1, workers=16)
+    # generate_parquet_row_chunked('A.parquet', rows=100000, cols=10000, seed=1, workers=16)
+
     # huge_csv_to_parquet("A.csv", "A.parquet")
     # huge_csv_to_parquet("B.csv", "B.parquet")
 
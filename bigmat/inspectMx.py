@@ -0,0 +1,292 @@
+# python3 inspectMx.py A.parquet              (dense or COO Parquet)
+# python3 inspectMx.py A.arrow --head 5       (Arrow IPC)
+# python3 inspectMx.py A_tiles                (tile directory from genMx)
+# python3 inspectMx.py A.npy                  (memory-mapped matrix from mmapMx)
+# python3 inspectMx.py A.csr                  (CSR/CSC store from csrMx)
+
+import numpy as np
+import polars as pl
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+import argparse
+import json
+import os
+
+from matmul import scan_tiles
+
+COO_COLUMNS = {"row", "col", "val"}
+
+
+def fmt_bytes(n):
+    for unit in ["B", "KB", "MB", "GB"]:
+        if n < 1024:
+            return f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+
+def parquet_column_ranges(meta, columns=None):
+    """
+    Min/max of each column from row-group statistics only.
+    Returns {name: (min, max)}; a column without statistics maps to (None, None).
+    """
+    names = meta.schema.to_arrow_schema().names
+    wanted = [i for i, n in enumerate(names) if columns is None or n in columns]
+    ranges = {}
+    for i in wanted:
+        lo = hi = None
+        for g in range(meta.num_row_groups):
+            st = meta.row_group(g).column(i).statistics
+            if st is None or not st.has_min_max:
+                lo = hi = None
+                break
+            lo = st.min if lo is None else min(lo, st.min)
+            hi = st.max if hi is None else max(hi, st.max)
+        ranges[names[i]] = (lo, hi)
+    return ranges
+
+
+def parquet_layout(meta):
+    """Row-group count/sizes, codecs and compressed/uncompressed bytes from a footer."""
+    rg_rows = [meta.row_group(g).num_rows for g in range(meta.num_row_groups)]
+    codecs = set()
+    compressed = uncompressed = 0
+    for g in range(meta.num_row_groups):
+        rg = meta.row_group(g)
+        for c in range(rg.num_columns):
+            cc = rg.column(c)
+            codecs.add(cc.compression)
+            compressed += cc.total_compressed_size
+            uncompressed += cc.total_uncompressed_size
+    return {
+        "row_groups": meta.num_row_groups,
+        "rg_rows_min": min(rg_rows) if rg_rows else 0,
+        "rg_rows_max": max(rg_rows) if rg_rows else 0,
+        "codecs": sorted(codecs),
+        "compressed": compressed,
+        "uncompressed": uncompressed,
+    }
+
+
+def inspect_parquet(path):
+    """Describe a dense or COO Parquet matrix from its footer."""
+    meta = pq.read_metadata(path)
+    names = meta.schema.to_arrow_schema().names
+    info = {"kind": "parquet", "path": path, "file_size": os.path.getsize(path), "columns": names}
+    info.update(parquet_layout(meta))
+
+    if COO_COLUMNS.issubset(names):
+        ranges = parquet_column_ranges(meta, COO_COLUMNS)
+        info["format"] = "coo"
+        info["nnz"] = meta.num_rows
+        info["ranges"] = ranges
+        if ranges["row"][1] is not None and ranges["col"][1] is not None:
+            n_rows, n_cols = ranges["row"][1] + 1, ranges["col"][1] + 1
+            info["shape"] = (n_rows, n_cols)
+            info["density"] = meta.num_rows / (n_rows * n_cols)
+    else:
+        ranges = parquet_column_ranges(meta)
+        los = [lo for lo, _ in ranges.values() if lo is not None]
+        his = [hi for _, hi in ranges.values() if hi is not None]
+        info["format"] = "dense"
+        info["shape"] = (meta.num_rows, len(names))
+        info["ranges"] = {"val": (min(los) if los else None, max(his) if his else None)}
+    return info
+
+
+def ipc_batch_stats(reader, columns):
+    """
+    One pass over the memory-mapped record batches of an IPC file: min/max
+    and nonzero count of each column, the in-memory size of the batches,
+    and whether any batch had to be decompressed (uncompressed batches are
+    zero-copy views of the mapping and allocate nothing).
+    """
+    ranges = {name: (None, None) for name in columns}
+    nonzeros = in_memory = 0
+    compressed = False
+    for b in range(reader.num_record_batches):
+        before = pa.total_allocated_bytes()
+        batch = reader.get_batch(b)
+        compressed |= pa.total_allocated_bytes() > before
+        in_memory += batch.nbytes
+        for name in columns:
+            column = batch.column(name)
+            mm = pc.min_max(column)
+            lo, hi = mm["min"].as_py(), mm["max"].as_py()
+            if lo is not None:
+                old_lo, old_hi = ranges[name]
+                ranges[name] = (lo if old_lo is None else min(old_lo, lo), hi if old_hi is None else max(old_hi, hi))
+            nonzeros += pc.sum(pc.not_equal(column, 0)).as_py() or 0
+    return ranges, nonzeros, in_memory, compressed
+
+
+def inspect_ipc(path, scan=True):
+    """
+    Describe an Arrow IPC file. IPC has no column statistics, so ranges,
+    density and in-memory size come from one scan of the memory-mapped
+    record batches; scan=False reads the footer only.
+    """
+    reader = ipc.open_file(pa.memory_map(path, "r"))
+    names = reader.schema.names
+    n_entries = reader.count_rows()
+    info = {
+        "kind": "ipc", "path": path, "file_size": os.path.getsize(path), "columns": names,
+        "batches": reader.num_record_batches,
+    }
+    if not scan:
+        info["format"] = "coo" if COO_COLUMNS.issubset(names) else "dense"
+        if info["format"] == "coo":
+            info["nnz"] = n_entries
+        else:
+            info["shape"] = (n_entries, len(names))
+        return info
+
+    if COO_COLUMNS.issubset(names):
+        ranges, _, in_memory, compressed = ipc_batch_stats(reader, ["row", "col", "val"])
+        info["format"] = "coo"
+        info["nnz"] = n_entries
+        info["ranges"] = ranges
+        if ranges["row"][1] is not None and ranges["col"][1] is not None:
+            n_rows, n_cols = ranges["row"][1] + 1, ranges["col"][1] + 1
+            info["shape"] = (n_rows, n_cols)
+            info["density"] = n_entries / (n_rows * n_cols)
+    else:
+        ranges, nonzeros, in_memory, compressed = ipc_batch_stats(reader, names)
+        los = [lo for lo, _ in ranges.values() if lo is not None]
+        his = [hi for _, hi in ranges.values() if hi is not None]
+        info["format"] = "dense"
+        info["shape"] = (n_entries, len(names))
+        info["density"] = nonzeros / (n_entries * len(names)) if n_entries * len(names) else 0.0
+        info["ranges"] = {"val": (min(los) if los else None, max(his) if his else None)}
+
+    info["codecs"] = ["buffer compression"] if compressed else ["none"]
+    info["in_memory"] = in_memory
+    return info
+
+
+def inspect_tiles(tile_dir):
+    """Describe a tile_{bi}_{bj}.parquet directory from the tile footers."""
+    paths, n_bi, n_bj = scan_tiles(tile_dir)
+
+    rows = [pq.read_metadata(paths[(bi, 0)]).num_rows for bi in range(n_bi)] if (0, 0) in paths else []
+    cols = [pq.read_metadata(paths[(0, bj)]).num_columns for bj in range(n_bj)] if (0, 0) in paths else []
+    info = {
+        "kind": "tiles", "path": tile_dir, "format": "dense",
+        "grid": (n_bi, n_bj), "tiles": len(paths), "missing": n_bi * n_bj - len(paths),
+        "shape": (sum(rows), sum(cols)),
+        "tile_shape": (max(rows, default=0), max(cols, default=0)),
+        "file_size": sum(os.path.getsize(p) for p in paths.values()),
+        "compressed": 0, "uncompressed": 0, "codecs": set(),
+    }
+    for p in paths.values():
+        layout = parquet_layout(pq.read_metadata(p))
+        info["compressed"] += layout["compressed"]
+        info["uncompressed"] += layout["uncompressed"]
+        info["codecs"].update(layout["codecs"])
+    info["codecs"] = sorted(info["codecs"])
+    return info
+
+
+def inspect_npy(path):
+    """Describe a .npy matrix from its header."""
+    with open(path, "rb") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+    return {
+        "kind": "npy", "path": path, "format": "dense", "shape": shape,
+        "dtype": str(dtype), "order": "F" if fortran_order else "C",
+        "file_size": os.path.getsize(path),
+    }
+
+
+def inspect_csr(store_dir):
+    """Describe a CSR/CSC store from its meta.json."""
+    with open(os.path.join(store_dir, "meta.json")) as f:
+        meta = json.load(f)
+    n_rows, n_cols = meta["shape"]
+    return {
+        "kind": meta["format"], "path": store_dir, "format": "sparse", "shape": (n_rows, n_cols),
+        "nnz": meta["nnz"], "density": meta["nnz"] / (n_rows * n_cols) if n_rows * n_cols else 0.0,
+        "file_size": sum(os.path.getsize(os.path.join(store_dir, f)) for f in os.listdir(store_dir)),
+    }
+
+
+def inspect_matrix(path):
+    """Dispatch on the storage kind and return a dict of metadata."""
+    if os.path.isdir(path) and os.path.exists(os.path.join(path, "meta.json")):
+        return inspect_csr(path)
+    if os.path.isdir(path):
+        return inspect_tiles(path)
+    if path.endswith(".npy"):
+        return inspect_npy(path)
+    with open(path, "rb") as f:
+        magic = f.read(6)
+    if magic.startswith(b"PAR1"):
+        return inspect_parquet(path)
+    if magic == b"ARROW1":
+        return inspect_ipc(path)
+    raise ValueError(f"Unrecognized matrix file: {path}")
+
+
+def print_info(info):
+    print(f"File: {info['path']} ({info['kind']}, {info['format']})")
+    if "shape" in info:
+        print(f"Shape: {info['shape'][0]} x {info['shape'][1]}")
+    if "nnz" in info:
+        print(f"Nonzeros: {info['nnz']}")
+    if "density" in info:
+        print(f"Estimated density: {info['density']:.3e}")
+    if "grid" in info:
+        print(f"Tile grid: {info['grid'][0]} x {info['grid'][1]} ({info['tiles']} tiles, {info['missing']} missing), "
+              f"tile shape up to {info['tile_shape'][0]} x {info['tile_shape'][1]}")
+    if "dtype" in info:
+        print(f"dtype: {info['dtype']}, order: {info['order']}")
+    if "batches" in info:
+        print(f"Record batches: {info['batches']}")
+    if "row_groups" in info:
+        print(f"Row groups: {info['row_groups']} ({info['rg_rows_min']}–{info['rg_rows_max']} rows each)")
+    for name, (lo, hi) in info.get("ranges", {}).items():
+        print(f"{name}: min={lo}, max={hi}")
+    if info.get("codecs"):
+        print(f"Compression: {', '.join(info['codecs'])}")
+    if info.get("in_memory"):
+        ratio = info["in_memory"] / info["file_size"]
+        print(f"Size: {fmt_bytes(info['file_size'])} on disk / {fmt_bytes(info['in_memory'])} "
+              f"in memory (ratio {ratio:.2f})")
+    if info.get("compressed"):
+        ratio = info["uncompressed"] / info["compressed"]
+        print(f"Size: {fmt_bytes(info['compressed'])} compressed / {fmt_bytes(info['uncompressed'])} "
+              f"uncompressed (ratio {ratio:.2f})")
+    print(f"File size: {fmt_bytes(info['file_size'])}")
+
+
+def head_rows(path, nrows=10):
+    """First nrows of a Parquet, IPC or .npy file, reading only the first batch."""
+    if path.endswith(".npy"):
+        return np.load(path, mmap_mode="r")[:nrows]
+    with open(path, "rb") as f:
+        magic = f.read(6)
+    if magic == b"ARROW1":
+        reader = ipc.open_file(pa.memory_map(path, "r"))
+        if reader.num_record_batches == 0:
+            return pl.DataFrame(schema=reader.schema.names)
+        return pl.from_arrow(pa.Table.from_batches([reader.get_batch(0).slice(0, nrows)]))
+    batch = next(pq.ParquetFile(path).iter_batches(batch_size=nrows), None)
+    return pl.from_arrow(pa.Table.from_batches([batch])) if batch is not None else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect a matrix (Parquet, COO Parquet, Arrow IPC, tiles, .npy, CSR/CSC) from metadata only; Arrow IPC is scanned through a memory map.")
+    parser.add_argument("path", help="Matrix file or tile directory")
+    parser.add_argument("--head", type=int, default=0, help="Also show the first N rows (reads one batch)")
+    args = parser.parse_args()
+
+    print_info(inspect_matrix(args.path))
+    if args.head and not os.path.isdir(args.path):
+        print(f"\nFirst {args.head} rows:")
+        print(head_rows(args.path, args.head))
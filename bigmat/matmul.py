@@ -1,79 +1,312 @@
-# python3 matmul.py A_dense.parquet B_dense.parquet C_dir --A_size 5000 --B_size 5000
+# python3 matmul.py A_dense.parquet B_dense.parquet C_dir --A_size 5000 --B_size 5000 --mem_mb 4096
+# python3 matmul.py A_tiles B_tiles C_tiles --mem_mb 8192   (tile_{bi}_{bj}.parquet directories from genMx)
+# python3 matmul.py A.npy B.npy C_dir                        (memory-mapped matrices from mmapMx.py)
 
-import polars as pl
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
+import re
 import time
 import argparse
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 
-def dense_block_matmul(A_parquet, B_parquet, C_dir, A_size=5000, B_size=5000):
+from mmapMx import open_matrix, iter_row_blocks, read_block
+
+
+def parquet_shape(path):
+    """(rows, cols, column names) of a dense Parquet matrix from its footer only."""
+    pf = pq.ParquetFile(path)
+    names = pf.schema_arrow.names
+    return pf.metadata.num_rows, len(names), names
+
+
+def table_to_fortran(table):
     """
-    Perform dense block matrix multiplication using Polars LazyFrame and save each block to Parquet.
+    Copy the columns of a numeric Arrow table into one Fortran-ordered
+    float array (each column contiguous), without going through Python objects.
+    """
+    cols = [table.column(i).combine_chunks().to_numpy(zero_copy_only=False) for i in range(table.num_columns)]
+    dtype = np.result_type(*[c.dtype for c in cols]) if cols else np.float32
+    out = np.empty((table.num_rows, table.num_columns), dtype=dtype, order="F")
+    for i, c in enumerate(cols):
+        out[:, i] = c
+    return out
+
+
+def write_block_fortran(C_np, col_names, path):
+    """
+    Write a Fortran-ordered block to Parquet; each column is a contiguous
+    slice wrapped by Arrow without copying.
+    """
+    arrays = [pa.array(C_np[:, j]) for j in range(C_np.shape[1])]
+    pq.write_table(pa.Table.from_arrays(arrays, names=col_names), path)
+
+
+def dense_block_matmul(A_parquet, B_parquet, C_dir, A_size=5000, B_size=5000, mem_budget=4 << 30,
+                       max_pending_writes=2):
+    """
+    Perform dense block matrix multiplication and save each C block to Parquet.
+    A and B are dense Parquet files or .npy matrices from mmapMx.py; .npy
+    blocks are memory-mapped views and are never cached or decoded.
+    Shapes come from Parquet metadata. A is streamed in blocks of A_size rows;
+    B column blocks (all rows x B_size columns) are cached across A row
+    blocks as long as they fit in mem_budget bytes, and re-read otherwise.
+    The next A block and the next B block are read on their own background
+    threads while BLAS runs, and C blocks are written on another thread
+    straight from NumPy buffers, with at most max_pending_writes C blocks
+    held for writing at a time.
     """
 
     # Create output directory if it doesn't exist
     os.makedirs(C_dir, exist_ok=True)
 
     # ----------------------------
-    # 1. Read LazyFrames
+    # 1. Shapes from metadata
     # ----------------------------
-    A_lf = pl.scan_parquet(A_parquet)  # Each column is a dense column
-    B_lf = pl.scan_parquet(B_parquet)
+    A_mm = A_parquet.endswith(".npy")
+    B_mm = B_parquet.endswith(".npy")
+    if A_mm:
+        A_mat = open_matrix(A_parquet)
+        A_nrows, A_ncols = A_mat.shape
+    else:
+        A_nrows, A_ncols, _ = parquet_shape(A_parquet)
+    if B_mm:
+        B_mat = open_matrix(B_parquet)
+        B_nrows, B_ncols = B_mat.shape
+    else:
+        B_nrows, B_ncols, B_names = parquet_shape(B_parquet)
+    if A_ncols != B_nrows:
+        print(f"Error: shape mismatch A ({A_nrows}x{A_ncols}) x B ({B_nrows}x{B_ncols})")
+        return
+    print(f"A: {A_nrows}x{A_ncols}, B: {B_nrows}x{B_ncols}")
+
+    B_blocks = [(s, min(s + B_size, B_ncols)) for s in range(0, B_ncols, B_size)]
+    if B_mm:
+        n_cached = 0
+        print("B is memory-mapped: column blocks are views, nothing cached")
+    else:
+        pf_B = pq.ParquetFile(B_parquet)
+        itemsize = pf_B.schema_arrow.field(0).type.byte_width if B_ncols else 4
+        B_block_bytes = B_nrows * B_size * itemsize
+        n_cached = min(len(B_blocks), max(0, int(mem_budget // max(B_block_bytes, 1))))
+        print(f"Caching {n_cached}/{len(B_blocks)} B column blocks ({B_block_bytes / 2**20:.1f} MB each)")
+    B_cache = {}
 
-    # Get matrix sizes
-    A_df = A_lf.collect()
-    B_df = B_lf.collect()
-    A_nrows = A_df.height
-    B_ncols = B_df.width
+    def load_B(j):
+        start, end = B_blocks[j]
+        if B_mm:
+            return read_block(B_mat, 0, B_nrows, start, end)
+        if j in B_cache:
+            return B_cache[j]
+        return table_to_fortran(pf_B.read(columns=B_names[start:end]))
 
+    if A_mm:
+        A_batches = (blk for _, blk in iter_row_blocks(A_mat, A_size))
+    else:
+        A_batches = (table_to_fortran(pa.Table.from_batches([b]))
+                     for b in pq.ParquetFile(A_parquet).iter_batches(batch_size=A_size))
 
     # ----------------------------
     # 2. Block-wise matrix multiplication
     # ----------------------------
-    current_A_row = 0
     block_idx = 0
     start_time = time.time()
+    A_reader = ThreadPoolExecutor(max_workers=1)
+    B_reader = ThreadPoolExecutor(max_workers=1)
+    writer = ThreadPoolExecutor(max_workers=1)
+    pending_writes = deque()
+
+    next_A = A_reader.submit(lambda: next(A_batches, None))
+    current_A_row = 0
 
-    while current_A_row < A_nrows:
-        end_A_row = min(current_A_row + A_size, A_nrows)
-        A_block = A_lf.slice(current_A_row, end_A_row - current_A_row).collect()
+    try:
+        while True:
+            A_np = next_A.result()
+            if A_np is None:
+                break
+            end_A_row = current_A_row + A_np.shape[0]
+            next_B = B_reader.submit(load_B, 0)
+            next_A = A_reader.submit(lambda: next(A_batches, None))
 
-        current_B_col = 0
-        while current_B_col < B_ncols:
-            end_B_col = min(current_B_col + B_size, B_ncols)
-            B_block_cols = B_lf.columns[current_B_col:end_B_col]
-            B_block = B_lf.select(B_block_cols).collect()
+            for j, (start_col, end_col) in enumerate(B_blocks):
+                B_np = next_B.result()
+                if j < n_cached:
+                    B_cache[j] = B_np
+                if j + 1 < len(B_blocks):
+                    next_B = B_reader.submit(load_B, j + 1)
 
-            # Convert to NumPy for block multiplication
-            A_np = A_block.to_numpy()
-            B_np = B_block.to_numpy()
-            C_np = A_np @ B_np  # Dense block multiplication
+                # (A @ B) computed as (B^T @ A^T)^T so the result is Fortran-ordered
+                C_np = (B_np.T @ A_np.T).T
 
-            # Save block to Parquet
-            C_block_file = os.path.join(C_dir, f"C_block_{block_idx}.parquet")
-            C_block = pl.DataFrame(C_np.tolist())
-            C_block.write_parquet(C_block_file)
+                C_block_file = os.path.join(C_dir, f"C_block_{block_idx}.parquet")
+                names = [f"col{c}" for c in range(start_col, end_col)]
+                # Bound the C blocks held in memory by the write queue
+                while len(pending_writes) >= max_pending_writes:
+                    pending_writes.popleft().result()
+                pending_writes.append(writer.submit(write_block_fortran, C_np, names, C_block_file))
 
-            print(f"Block {block_idx} done: A rows {current_A_row}-{end_A_row}, B cols {current_B_col}-{end_B_col}")
+                print(f"Block {block_idx} done: A rows {current_A_row}-{end_A_row}, B cols {start_col}-{end_col}")
+                block_idx += 1
 
-            current_B_col = end_B_col
-            block_idx += 1
+            current_A_row = end_A_row
 
-        current_A_row = end_A_row
+        while pending_writes:
+            pending_writes.popleft().result()
+    finally:
+        A_reader.shutdown(wait=True)
+        B_reader.shutdown(wait=True)
+        writer.shutdown(wait=True)
 
     end_time = time.time()
     print(f"Dense block matrix multiplication finished in {end_time - start_time:.2f} s")
 
 
+# ----------------------------
+# Tiled out-of-core multiplication
+# ----------------------------
+TILE_RE = re.compile(r"tile_(\d+)_(\d+)\.parquet$")
+
+
+def scan_tiles(tile_dir):
+    """
+    Tile files of a directory written by genMx.generate_parquet_2d_tiled.
+    Returns (paths, n_bi, n_bj): paths[(bi, bj)] -> file and the grid size
+    spanned by the tiles found. Raises ValueError if there are no tiles.
+    """
+    paths = {}
+    for name in os.listdir(tile_dir):
+        m = TILE_RE.match(name)
+        if m:
+            paths[(int(m.group(1)), int(m.group(2)))] = os.path.join(tile_dir, name)
+    if not paths:
+        raise ValueError(f"{tile_dir}: no tile_<bi>_<bj>.parquet files (not a tile directory)")
+
+    n_bi = max(bi for bi, _ in paths) + 1
+    n_bj = max(bj for _, bj in paths) + 1
+    return paths, n_bi, n_bj
+
+
+def tile_grid(tile_dir):
+    """
+    Scan a complete tile directory written by genMx.generate_parquet_2d_tiled.
+    Returns (paths, row_sizes, col_sizes): paths[(bi, bj)] -> file, and the
+    number of rows / columns of each tile row / tile column from the footers.
+    """
+    paths, n_bi, n_bj = scan_tiles(tile_dir)
+    missing = [(bi, bj) for bi in range(n_bi) for bj in range(n_bj) if (bi, bj) not in paths]
+    if missing:
+        raise ValueError(f"{tile_dir}: missing tiles {missing[:5]}")
+
+    row_sizes = [pq.read_metadata(paths[(bi, 0)]).num_rows for bi in range(n_bi)]
+    col_sizes = [pq.read_metadata(paths[(0, bj)]).num_columns for bj in range(n_bj)]
+    return paths, row_sizes, col_sizes
+
+
+class LRUTileCache:
+    """Least-recently-used cache of decoded tiles, bounded by total bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.tiles = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.bytes_read = 0
+
+    def get(self, path):
+        if path in self.tiles:
+            self.tiles.move_to_end(path)
+            self.hits += 1
+            return self.tiles[path]
+
+        self.misses += 1
+        tile = table_to_fortran(pq.read_table(path))
+        self.bytes_read += tile.nbytes
+
+        while self.tiles and self.bytes + tile.nbytes > self.max_bytes:
+            _, old = self.tiles.popitem(last=False)
+            self.bytes -= old.nbytes
+        if tile.nbytes <= self.max_bytes:
+            self.tiles[path] = tile
+            self.bytes += tile.nbytes
+        return tile
+
+
+def tiled_matmul(A_dir, B_dir, C_dir, mem_budget=4 << 30):
+    """
+    Compute C[i,j] = sum_k A[i,k] @ B[k,j] over two tile directories and
+    write C as tile_{bi}_{bj}.parquet in the same layout.
+    Tiles are held in an LRU cache of mem_budget bytes. The outer loop runs
+    over whichever of A tile rows / B tile columns gives fewer bytes read
+    (the panel kept hot is reused across the whole inner loop), and the
+    inner loop snakes back and forth so tiles at the turn stay cached.
+    """
+    os.makedirs(C_dir, exist_ok=True)
+
+    A_paths, A_rows, A_cols = tile_grid(A_dir)
+    B_paths, B_rows, B_cols = tile_grid(B_dir)
+    if A_cols != B_rows:
+        print(f"Error: A tile columns {A_cols} do not match B tile rows {B_rows}")
+        return
+
+    n_i, n_k, n_j = len(A_rows), len(A_cols), len(B_cols)
+    A_bytes = sum(os.path.getsize(p) for p in A_paths.values())
+    B_bytes = sum(os.path.getsize(p) for p in B_paths.values())
+    print(f"A: {sum(A_rows)}x{sum(A_cols)} in {n_i}x{n_k} tiles, B: {sum(B_rows)}x{sum(B_cols)} in {n_k}x{n_j} tiles")
+
+    # i-outer reads A once and B n_i times; j-outer reads B once and A n_j times
+    i_outer = A_bytes + n_i * B_bytes <= B_bytes + n_j * A_bytes
+    print(f"Loop order: {'i (A tile rows)' if i_outer else 'j (B tile columns)'} outer")
+
+    col_offsets = np.concatenate(([0], np.cumsum(B_cols))).astype(int)
+    cache = LRUTileCache(mem_budget)
+    start_time = time.time()
+
+    outer = range(n_i) if i_outer else range(n_j)
+    inner = list(range(n_j) if i_outer else range(n_i))
+    for o in outer:
+        for inn in (inner if o % 2 == 0 else inner[::-1]):
+            bi, bj = (o, inn) if i_outer else (inn, o)
+            C_tile = None
+            ks = range(n_k) if (o + inn) % 2 == 0 else range(n_k - 1, -1, -1)
+            for k in ks:
+                A_t = cache.get(A_paths[(bi, k)])
+                B_t = cache.get(B_paths[(k, bj)])
+                prod = (B_t.T @ A_t.T).T  # Fortran-ordered A_t @ B_t
+                if C_tile is None:
+                    C_tile = np.asfortranarray(prod)
+                else:
+                    C_tile += prod
+
+            names = [f"col{c}" for c in range(col_offsets[bj], col_offsets[bj + 1])]
+            arrays = [pa.array(C_tile[:, c]) for c in range(C_tile.shape[1])]
+            out_file = f"{C_dir}/tile_{bi:04d}_{bj:04d}.parquet"
+            pq.write_table(pa.Table.from_arrays(arrays, names=names), out_file, compression="zstd")
+            print(f"Tile ({bi}, {bj}) done")
+
+    end_time = time.time()
+    print(f"Tiled matrix multiplication finished in {end_time - start_time:.2f} s "
+          f"(cache hits {cache.hits}, misses {cache.misses}, decoded {cache.bytes_read / 2**20:.1f} MB)")
+
+
 # ----------------------------
 # CLI using argparse
 # ----------------------------
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Dense block matrix multiplication using Polars LazyFrame")
-    parser.add_argument("A_parquet", help="Input Parquet file for matrix A")
-    parser.add_argument("B_parquet", help="Input Parquet file for matrix B")
-    parser.add_argument("C_dir", help="Output directory to store block Parquet files")
+    parser = argparse.ArgumentParser(description="Dense block matrix multiplication with prefetching and a B block cache")
+    parser.add_argument("A_parquet", help="Input Parquet file (or tile directory, or .npy) for matrix A")
+    parser.add_argument("B_parquet", help="Input Parquet file (or tile directory, or .npy) for matrix B")
+    parser.add_argument("C_dir", help="Output directory to store block (or tile) Parquet files")
     parser.add_argument("--A_size", type=int, default=5000, help="Number of rows per block for A")
     parser.add_argument("--B_size", type=int, default=5000, help="Number of columns per block for B")
+    parser.add_argument("--mem_mb", type=int, default=4096, help="Memory budget for cached B blocks / tiles (MB)")
+    parser.add_argument("--pending_writes", type=int, default=2, help="C blocks held for writing at most (dense blocks)")
 
     args = parser.parse_args()
-    dense_block_matmul(args.A_parquet, args.B_parquet, args.C_dir, args.A_size, args.B_size)
+    if os.path.isdir(args.A_parquet) and os.path.isdir(args.B_parquet):
+        tiled_matmul(args.A_parquet, args.B_parquet, args.C_dir, mem_budget=args.mem_mb * 1024 * 1024)
+    else:
+        dense_block_matmul(args.A_parquet, args.B_parquet, args.C_dir, args.A_size, args.B_size,
+                           mem_budget=args.mem_mb * 1024 * 1024, max_pending_writes=args.pending_writes)
@@ -0,0 +1,125 @@
+# python3 mmapMx.py A_dense.parquet A.npy            (dense Parquet -> memory-mapped .npy)
+# python3 mmapMx.py A_tiles A.npy                    (tile directory -> memory-mapped .npy)
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import argparse
+import json
+import os
+
+
+def names_path(npy_path):
+    """Sidecar file holding the column names of a .npy matrix."""
+    return npy_path + ".names.json"
+
+
+def parquet_to_npy(parquet_path, npy_path, order="F", batch_rows=65536):
+    """
+    Convert a dense Parquet matrix to an uncompressed .npy file that can be
+    memory-mapped. order="F" stores each column contiguously (column blocks
+    are contiguous views), order="C" stores rows contiguously.
+    Streams row groups, so memory use is one batch.
+    """
+    pf = pq.ParquetFile(parquet_path)
+    names = pf.schema_arrow.names
+    n_rows, n_cols = pf.metadata.num_rows, len(names)
+    dtype = pf.schema_arrow.field(0).type.to_pandas_dtype() if n_cols else np.float32
+    print(f"Converting {parquet_path} ({n_rows}x{n_cols}, {np.dtype(dtype).name}) → {npy_path} (order {order})")
+
+    M = np.lib.format.open_memmap(npy_path, mode="w+", dtype=dtype, shape=(n_rows, n_cols),
+                                  fortran_order=(order == "F"))
+    offset = 0
+    for batch in pf.iter_batches(batch_size=batch_rows):
+        for j in range(n_cols):
+            M[offset:offset + batch.num_rows, j] = batch.column(j).to_numpy(zero_copy_only=False)
+        offset += batch.num_rows
+    M.flush()
+    del M
+
+    with open(names_path(npy_path), "w") as f:
+        json.dump(names, f)
+    print(f"Done: {npy_path}")
+
+
+def tiles_to_npy(tile_dir, npy_path, order="F"):
+    """
+    Convert a tile_{bi}_{bj}.parquet directory (genMx.generate_parquet_2d_tiled)
+    into one memory-mapped .npy matrix, one tile at a time.
+    """
+    from matmul import tile_grid, table_to_fortran  # matmul imports this module, so import lazily
+
+    paths, row_sizes, col_sizes = tile_grid(tile_dir)
+    row_off = np.concatenate(([0], np.cumsum(row_sizes))).astype(int)
+    col_off = np.concatenate(([0], np.cumsum(col_sizes))).astype(int)
+    first = pq.read_schema(paths[(0, 0)])
+    dtype = first.field(0).type.to_pandas_dtype()
+    print(f"Converting {tile_dir} ({row_off[-1]}x{col_off[-1]}) → {npy_path} (order {order})")
+
+    M = np.lib.format.open_memmap(npy_path, mode="w+", dtype=dtype, shape=(int(row_off[-1]), int(col_off[-1])),
+                                  fortran_order=(order == "F"))
+    names = []
+    for bj in range(len(col_sizes)):
+        names.extend(pq.read_schema(paths[(0, bj)]).names)
+        for bi in range(len(row_sizes)):
+            M[row_off[bi]:row_off[bi + 1], col_off[bj]:col_off[bj + 1]] = table_to_fortran(pq.read_table(paths[(bi, bj)]))
+    M.flush()
+    del M
+
+    with open(names_path(npy_path), "w") as f:
+        json.dump(names, f)
+    print(f"Done: {npy_path}")
+
+
+def open_matrix(npy_path):
+    """Open a .npy matrix read-only as a memory map; nothing is read until accessed."""
+    return np.load(npy_path, mmap_mode="r")
+
+
+def matrix_names(npy_path):
+    """Column names stored next to a .npy matrix (col{i} if there is no sidecar)."""
+    if os.path.exists(names_path(npy_path)):
+        with open(names_path(npy_path)) as f:
+            return json.load(f)
+    return [f"col{i}" for i in range(open_matrix(npy_path).shape[1])]
+
+
+def read_block(M, row_start, row_end, col_start, col_end):
+    """
+    Block of an open matrix as a NumPy view (no decode, no copy). Column
+    blocks of an F-ordered matrix and row blocks of a C-ordered one are contiguous.
+    """
+    return M[row_start:row_end, col_start:col_end]
+
+
+def iter_row_blocks(M, block_rows):
+    """Yield (row_start, view) for consecutive row blocks of an open matrix."""
+    for start in range(0, M.shape[0], block_rows):
+        yield start, M[start:start + block_rows]
+
+
+def iter_col_blocks(M, block_cols):
+    """Yield (col_start, view) for consecutive column blocks of an open matrix."""
+    for start in range(0, M.shape[1], block_cols):
+        yield start, M[:, start:start + block_cols]
+
+
+def npy_to_table(M, names=None):
+    """Arrow table over the columns of a matrix; F-ordered columns are wrapped without copying."""
+    names = names or [f"col{i}" for i in range(M.shape[1])]
+    return pa.Table.from_arrays([pa.array(M[:, j]) for j in range(M.shape[1])], names=names)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a dense Parquet matrix or tile directory to memory-mapped .npy")
+    parser.add_argument("input", help="Dense Parquet file or tile directory")
+    parser.add_argument("output", help="Output .npy file")
+    parser.add_argument("--order", choices=["F", "C"], default="F",
+                        help="F: columns contiguous (default), C: rows contiguous")
+    parser.add_argument("--batch_rows", type=int, default=65536, help="Rows per batch when converting Parquet")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.input):
+        tiles_to_npy(args.input, args.output, order=args.order)
+    else:
+        parquet_to_npy(args.input, args.output, order=args.order, batch_rows=args.batch_rows)
@@ -0,0 +1,93 @@
+import json
+import os
+import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+def iter_parquet_chunks(path, chunk_size=1_000_000, columns=None):
+    """
+    Yield (offset, DataFrame) chunks of about chunk_size rows from a Parquet
+    file in one sequential pass over its row groups.
+    Unlike scan_parquet().slice(offset), later chunks cost no more than early ones.
+    """
+    pf = pq.ParquetFile(path)
+    offset = 0
+    for batch in pf.iter_batches(batch_size=chunk_size, columns=columns):
+        df = pl.from_arrow(pa.Table.from_batches([batch]))
+        yield offset, df
+        offset += df.height
+
+
+def parquet_chunk_plan(path, chunk_size=1_000_000):
+    """
+    Group consecutive row groups into chunks of at most chunk_size rows
+    (a row group larger than chunk_size forms its own chunk).
+    Returns a list of (offset, n_rows, [row group indices]) for random access
+    with read_parquet_chunk.
+    """
+    meta = pq.read_metadata(path)
+    plan = []
+    groups, n_rows, offset = [], 0, 0
+
+    for i in range(meta.num_row_groups):
+        rg_rows = meta.row_group(i).num_rows
+        if groups and n_rows + rg_rows > chunk_size:
+            plan.append((offset, n_rows, groups))
+            offset += n_rows
+            groups, n_rows = [], 0
+        groups.append(i)
+        n_rows += rg_rows
+
+    if groups:
+        plan.append((offset, n_rows, groups))
+
+    return plan
+
+
+def column_max(path, name, chunk_size=1_000_000):
+    """
+    Largest value of an integer column: from row-group statistics when every
+    row group has them, otherwise from one scan of the column. -1 if empty.
+    """
+    meta = pq.read_metadata(path)
+    i = meta.schema.to_arrow_schema().get_field_index(name)
+    stats = [meta.row_group(g).column(i).statistics for g in range(meta.num_row_groups)
+             if meta.row_group(g).num_rows]
+    if all(s is not None and s.has_min_max for s in stats):
+        return max((s.max for s in stats), default=-1)
+    best = -1
+    for _, chunk in iter_parquet_chunks(path, chunk_size, columns=[name]):
+        if chunk.height:
+            best = max(best, int(chunk[name].max()))
+    return best
+
+
+def read_parquet_chunk(path, row_groups, columns=None):
+    """Read the given row groups of a Parquet file as one DataFrame."""
+    return pl.from_arrow(pq.ParquetFile(path).read_row_groups(row_groups, columns=columns))
+
+
+def write_dataset_manifest(out_dir, parts, **info):
+    """
+    Write out_dir/_manifest.json describing a dataset of part files.
+    parts is a list of dicts with at least "path" (relative to out_dir) and "num_rows".
+    """
+    manifest = dict(info)
+    manifest["num_rows"] = sum(p["num_rows"] for p in parts)
+    manifest["parts"] = parts
+    with open(os.path.join(out_dir, "_manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def dataset_files(path):
+    """
+    Part files of a dataset: the files listed in path/_manifest.json for a
+    directory, or [path] for a single Parquet file.
+    """
+    if not os.path.isdir(path):
+        return [path]
+    with open(os.path.join(path, "_manifest.json")) as f:
+        manifest = json.load(f)
+    return [os.path.join(path, p["path"]) for p in manifest["parts"]]
@@ -1,20 +1,21 @@
 #python3 seeArrowIPC.py ---.arrow
 
 import argparse
-import pyarrow.ipc as ipc
-import polars as pl
+
+from inspectMx import inspect_ipc, head_rows
 
 def seeArrowIPC(path, nrows=10):
     """
     Show number of rows, columns, and first 10 rows of an Arrow IPC file.
+    The file is memory-mapped: only the footer and the first batch are read.
     """
-    df = pl.read_ipc(path)
-    n_rows = df.height
-    n_cols = df.width
+    info = inspect_ipc(path, scan=False)
+    n_cols = len(info["columns"])
+    n_rows = info["nnz"] if info["format"] == "coo" else info["shape"][0]
     print(f'File: {path}')
-    print(f'Rows: {n_rows}, Columns: {n_cols}')
+    print(f'Rows: {n_rows}, Columns: {n_cols}, Record batches: {info["batches"]}')
     print('First rows:')
-    print(df.head(nrows))
+    print(head_rows(path, nrows))
 
 
 
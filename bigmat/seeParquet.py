@@ -1,26 +1,22 @@
 #python3 seeParquet.py ---.parquet
 
 import argparse
-import polars as pl
-import pyarrow.parquet as pq
+
+from inspectMx import inspect_parquet, print_info, head_rows
 
 def seeParquet(parquet_path):
     """
-    Show number of rows, columns, and first 5 rows of a Parquet file.
+    Show number of rows, columns, row-group layout, codecs, value ranges
+    and first 10 rows of a Parquet file. Only the footer and the first
+    batch are read.
     """
-    # --- PyArrow for metadata ---
-    pq_file = pq.ParquetFile(parquet_path)
-    total_rows = pq_file.metadata.num_rows
-    total_cols = len(pq_file.schema)
-
-    print(f"File: {parquet_path}")
-    print(f"Number of rows: {total_rows}")
-    print(f"Number of columns: {total_cols}")
+    # --- footer only: shape, row groups, codecs, statistics ---
+    info = inspect_parquet(parquet_path)
+    print_info(info)
 
-    # --- Polars LazyFrame for first 10 rows ---
-    lf = pl.scan_parquet(parquet_path)
+    # --- first batch only for the first 10 rows ---
     print("\nFirst 10 rows:")
-    print(lf.head(10).collect())
+    print(head_rows(parquet_path, 10))
 
 
 
@@ -0,0 +1,221 @@
+# python3 sortCOO.py sort A_coo.parquet A_sorted.parquet --by row --mem_mb 1024
+# python3 sortCOO.py slice A_sorted.parquet A_rows.parquet --lo 5000000 --hi 6000000
+
+import numpy as np
+import polars as pl
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+import argparse
+import os
+import shutil
+import tempfile
+
+from parquetChunks import iter_parquet_chunks, read_parquet_chunk, column_max
+from colStats import file_key
+
+
+def index_path(parquet_path):
+    """Sidecar index file of a sorted COO Parquet file."""
+    return parquet_path + ".idx.npz"
+
+
+def aligned_cuts(keys, target_rows):
+    """
+    Cut points for row groups of about target_rows entries over sorted keys,
+    moved back to the start of a key run so no key spans two row groups
+    (unless a single key has more than target_rows entries).
+    """
+    cuts = [0]
+    n = len(keys)
+    while n - cuts[-1] > target_rows:
+        t = cuts[-1] + target_rows
+        cut = int(np.searchsorted(keys, keys[t], side="left"))
+        if cut <= cuts[-1]:
+            cut = int(np.searchsorted(keys, keys[t], side="right"))
+        if cut >= n:
+            break
+        cuts.append(cut)
+    cuts.append(n)
+    return cuts
+
+
+def sort_coo_parquet(input_path, output_path, by="row", chunk_size=1_000_000, memory_budget=1 << 30,
+                     row_group_size=1_000_000, tmp_dir=None):
+    """
+    Sort a COO Parquet file by (row, col) (by="row") or (col, row) (by="col")
+    out of core, and write a sidecar index next to the output.
+
+    Pass 1 range-partitions the input by key into buckets sized to fit
+    memory_budget (one Arrow IPC run file per bucket). Pass 2 sorts each
+    bucket in memory and appends it to the output with row groups cut at
+    key boundaries. Both inputs and runs are read once.
+    """
+    other = "col" if by == "row" else "row"
+
+    if os.path.exists(output_path):
+        os.remove(output_path)
+
+    meta = pq.read_metadata(input_path)
+    n_keys = column_max(input_path, by, chunk_size) + 1
+
+    # ~12 bytes per entry in memory; twice the buckets for headroom against skew
+    n_buckets = max(1, int(np.ceil(2 * 12 * meta.num_rows / max(memory_budget, 1))))
+    width = max(1, int(np.ceil(n_keys / n_buckets)))
+    n_buckets = int(np.ceil(n_keys / width))
+    print(f"Sorting {input_path} by ({by}, {other}): {meta.num_rows} entries, {n_keys} keys, "
+          f"{n_buckets} buckets of {width} keys")
+
+    work_dir = tempfile.mkdtemp(prefix="sortcoo_", dir=tmp_dir or os.path.dirname(os.path.abspath(output_path)))
+    try:
+        # ---------------------------------------------------
+        # Pass 1: range-partition into bucket runs
+        # ---------------------------------------------------
+        schema = pa.schema([("row", pa.int32()), ("col", pa.int32()), ("val", pa.float32())])
+        writers = {}
+        for offset, chunk in iter_parquet_chunks(input_path, chunk_size, columns=["row", "col", "val"]):
+            print(f"  Partitioning rows {offset} -> {offset+chunk.height}")
+            chunk = chunk.with_columns([
+                pl.col("row").cast(pl.Int32),
+                pl.col("col").cast(pl.Int32),
+                pl.col("val").cast(pl.Float32),
+                (pl.col(by) // width).alias("bucket"),
+            ])
+            for (b,), part in chunk.partition_by("bucket", as_dict=True, include_key=False).items():
+                if b not in writers:
+                    writers[b] = ipc.new_file(os.path.join(work_dir, f"bucket_{b}.arrow"), schema)
+                writers[b].write_table(part.to_arrow().cast(schema))
+        for w in writers.values():
+            w.close()
+
+        # ---------------------------------------------------
+        # Pass 2: sort buckets in key order, write aligned row groups
+        # ---------------------------------------------------
+        writer = pq.ParquetWriter(output_path, schema)
+        indptr_counts = np.zeros(n_keys, dtype=np.int64)
+        rg_offsets, rg_min, rg_max = [], [], []
+        total = 0
+
+        for b in sorted(writers):
+            run = ipc.open_file(pa.memory_map(os.path.join(work_dir, f"bucket_{b}.arrow"))).read_all()
+            part = pl.from_arrow(run).sort([by, other])
+            keys = part[by].to_numpy()
+            indptr_counts += np.bincount(keys, minlength=n_keys)
+
+            cuts = aligned_cuts(keys, row_group_size)
+            for lo, hi in zip(cuts[:-1], cuts[1:]):
+                writer.write_table(part.slice(lo, hi - lo).to_arrow().cast(schema), row_group_size=hi - lo)
+                rg_offsets.append(total + lo)
+                rg_min.append(int(keys[lo]))
+                rg_max.append(int(keys[hi - 1]))
+            total += len(keys)
+            print(f"  Bucket {b}: {len(keys)} entries in {len(cuts) - 1} row groups")
+
+        writer.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    save_coo_index(output_path, by, indptr_counts, rg_offsets + [total], rg_min, rg_max)
+    print(f"Done. Wrote {output_path} ({total} entries, {len(rg_min)} row groups) and {index_path(output_path)}")
+
+
+def save_coo_index(parquet_path, by, key_counts, rg_offsets, rg_min, rg_max):
+    """
+    Write the sidecar index of a COO file sorted by `by`: entries per key,
+    row-group start offsets (plus the total) and per-row-group key ranges.
+    The index is keyed by the file's size/mtime/footer hash (colStats.file_key)
+    and must be written after the Parquet file is closed.
+    """
+    fk = file_key(parquet_path)
+    np.savez(
+        index_path(parquet_path),
+        size=fk["size"], mtime_ns=fk["mtime_ns"], footer=np.array(fk["footer"]),
+        key=np.array(by), indptr=np.concatenate(([0], np.cumsum(key_counts))),
+        rg_offsets=np.array(rg_offsets, dtype=np.int64),
+        rg_min_key=np.array(rg_min, dtype=np.int64), rg_max_key=np.array(rg_max, dtype=np.int64),
+    )
+
+
+def load_coo_index(parquet_path):
+    """
+    Load the sidecar index of a sorted COO file, or None if there is none or
+    it does not match the file's current size/mtime/footer hash.
+    """
+    path = index_path(parquet_path)
+    if not os.path.exists(path):
+        return None
+    fk = file_key(parquet_path)
+    with np.load(path) as z:
+        if ("footer" not in z.files or int(z["size"]) != fk["size"] or int(z["mtime_ns"]) != fk["mtime_ns"]
+                or str(z["footer"]) != fk["footer"]):
+            print(f"Ignoring stale sort index {path}")
+            return None
+        return ({name: z[name] for name in z.files if name not in ("size", "mtime_ns", "footer")}
+                | {"key": str(z["key"])})
+
+
+def row_groups_for_keys(index, lo, hi):
+    """Row groups of a sorted COO file that hold keys in [lo, hi)."""
+    hit = (index["rg_max_key"] >= lo) & (index["rg_min_key"] < hi)
+    return np.flatnonzero(hit).tolist()
+
+
+def read_key_range(parquet_path, lo, hi, index=None):
+    """
+    Entries of a sorted COO file with key (row or col, as sorted) in [lo, hi),
+    reading only the row groups that can contain them.
+    """
+    index = index or load_coo_index(parquet_path)
+    if index is None:
+        raise ValueError(f"{parquet_path} has no valid sort index; run sortCOO.py sort first")
+    groups = row_groups_for_keys(index, lo, hi)
+    if not groups:
+        return pl.DataFrame(schema={"row": pl.Int32, "col": pl.Int32, "val": pl.Float32})
+    key = index["key"]
+    return (
+        read_parquet_chunk(parquet_path, groups, columns=["row", "col", "val"])
+        .filter((pl.col(key) >= lo) & (pl.col(key) < hi))
+    )
+
+
+def key_nnz(index, lo, hi):
+    """Number of entries with key in [lo, hi), from the indptr alone."""
+    indptr = index["indptr"]
+    lo, hi = max(lo, 0), min(hi, len(indptr) - 1)
+    return int(indptr[hi] - indptr[lo]) if hi > lo else 0
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sort COO Parquet out of core and slice sorted files via the sidecar index")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_sort = sub.add_parser("sort", help="Sort by (row, col) or (col, row) and write a sidecar index")
+    p_sort.add_argument("input_path", help="Input COO Parquet")
+    p_sort.add_argument("output_path", help="Output sorted COO Parquet")
+    p_sort.add_argument("--by", choices=["row", "col"], default="row", help="Primary sort key")
+    p_sort.add_argument("--chunk", type=int, default=1_000_000, help="Rows per input chunk")
+    p_sort.add_argument("--mem_mb", type=int, default=1024, help="Memory budget per bucket (MB)")
+    p_sort.add_argument("--row_group_size", type=int, default=1_000_000, help="Target rows per output row group")
+    p_sort.add_argument("--tmp_dir", default=None, help="Directory for bucket runs (default: next to output)")
+
+    p_slice = sub.add_parser("slice", help="Extract keys [lo, hi) from a sorted file")
+    p_slice.add_argument("input_path", help="Sorted COO Parquet with sidecar index")
+    p_slice.add_argument("output_path", help="Output COO Parquet")
+    p_slice.add_argument("--lo", type=int, required=True, help="First key (inclusive)")
+    p_slice.add_argument("--hi", type=int, required=True, help="Last key (exclusive)")
+
+    args = parser.parse_args()
+
+    if args.cmd == "sort":
+        sort_coo_parquet(args.input_path, args.output_path, by=args.by, chunk_size=args.chunk,
+                         memory_budget=args.mem_mb * 1024 * 1024, row_group_size=args.row_group_size,
+                         tmp_dir=args.tmp_dir)
+    else:
+        index = load_coo_index(args.input_path)
+        df = read_key_range(args.input_path, args.lo, args.hi, index)
+        df.write_parquet(args.output_path)
+        print(f"Wrote {df.height} entries with {index['key']} in [{args.lo}, {args.hi}) to {args.output_path} "
+              f"({len(row_groups_for_keys(index, args.lo, args.hi))} row groups read)")
@@ -1,5 +1,6 @@
 # python3 stdCOO.py A_coo.parquet Astd_coo.parquet -n 2000 --chunk 1000000
 
+import numpy as np
 import polars as pl
 import pyarrow.parquet as pq
 import pyarrow as pa
@@ -7,11 +8,38 @@ import argparse
 import os
 import math
 
-def standardize_coo_parquet(input_path, output_path, total_rows, chunk_size=1_000_000):
+from parquetChunks import iter_parquet_chunks
+from colStats import column_stats, coo_chunk_stats, merge_stats, save_stats
+
+def coo_column_stats(input_path, total_rows):
+    """
+    Per-column sum / sum of squares of the stored nonzeros of a COO Parquet
+    file, and the true mean/std with implicit zeros counted (population std).
+    Sums come from the colStats sidecar when it is valid.
+    Returns a DataFrame with columns col, sum_nz, sum_sq_nz, mean, std.
+    """
+    stats = column_stats(input_path)
+    cols = np.flatnonzero(stats["count"])
+    mean = stats["sum"][cols] / total_rows
+    var = stats["sumsq"][cols] / total_rows - mean ** 2
+    return pl.DataFrame({
+        "col": cols.astype(np.int32),
+        "sum_nz": stats["sum"][cols],
+        "sum_sq_nz": stats["sumsq"][cols],
+        "mean": mean,
+        "std": np.sqrt(np.clip(var, 1e-12, None)),
+    })
+
+
+def standardize_coo_parquet(input_path, output_path, total_rows, chunk_size=1_000_000, row_group_size=None):
     """
     Standardize each column of a COO Parquet file using true mean/std
     where zeros are implicit (COO contains only nonzero values).
     row/col are cast to int32.
+    row_group_size sets the output row-group size (default: one per chunk).
+    Stats are dense per-column arrays (streamed with np.bincount, or taken
+    from the colStats sidecar) and each chunk looks its columns up by
+    index, so memory is O(ncols + one chunk).
     """
 
     if os.path.exists(output_path):
@@ -21,39 +49,14 @@ def standardize_coo_parquet(input_path, output_path, total_rows, chunk_size=1_00
     # Step 1: Compute corrected mean/std for each column
     # ---------------------------------------------------
     print(f"Computing corrected column-wise mean/std for: {input_path}")
-    coo = pl.read_parquet(input_path)
-
-    # Cast row/col to int32 for safety
-    coo = coo.with_columns([
-        pl.col("row").cast(pl.Int32),
-        pl.col("col").cast(pl.Int32),
-        pl.col("val").cast(pl.Float32)
-    ])
-
-    # aggregate nonzero stats
-    stats = (
-        coo.group_by("col")
-        .agg([
-            pl.col("val").sum().alias("sum_nz"),
-            (pl.col("val")**2).sum().alias("sum_sq_nz")
-        ])
-        .with_columns([
-            (pl.col("sum_nz") / total_rows).alias("mean"),
-            (
-                (pl.col("sum_sq_nz") / total_rows)
-                - (pl.col("sum_nz") / total_rows) ** 2
-            ).alias("var")
-        ])
-        .with_columns([
-            pl.col("var").clip(1e-12, None).sqrt().alias("std")
-        ])
-        .select(["col", "mean", "std"])
-        .with_columns([
-            pl.col("col").cast(pl.Int32)  # cast stats col to int32
-        ])
-    )
-
-    print(f"Computed stats for {stats.height} columns")
+    stats = column_stats(input_path)
+    present = stats["count"] > 0
+    mean = stats["sum"] / total_rows
+    std = np.sqrt(np.clip(stats["sumsq"] / total_rows - mean ** 2, 1e-12, None))
+    # columns without entries have no std; their lookups are never used
+    inv_std = np.where(present, 1.0 / std, 0.0)
+
+    print(f"Computed stats for {int(present.sum())} columns")
 
     # ---------------------------------------------------
     # Step 2: Process in chunks
@@ -62,42 +65,27 @@ def standardize_coo_parquet(input_path, output_path, total_rows, chunk_size=1_00
     max_rows = meta.num_rows
     print(f"Processing {max_rows} rows in chunks of {chunk_size}")
 
-    offset = 0
-    first_chunk = True
-
-    while offset < max_rows:
-        print(f"Processing rows {offset} -> {min(offset+chunk_size, max_rows)}")
-
-        chunk = pl.scan_parquet(input_path).slice(offset, chunk_size).collect()
-
-        # cast row/col in each chunk
-        chunk = chunk.with_columns([
-            pl.col("row").cast(pl.Int32),
-            pl.col("col").cast(pl.Int32),
-            pl.col("val").cast(pl.Float32)
-        ])
+    schema = pa.schema([("row", pa.int32()), ("col", pa.int32()), ("val", pa.float32())])
+    writer = pq.ParquetWriter(output_path, schema)
+    out_stats = None
 
-        # Standardize values safely
-        chunk_std = (
-            chunk.join(stats, on="col")
-            .with_columns([
-                pl.when(pl.col("std").is_null() | (pl.col("std") == 0))
-                .then(0.0)
-                .otherwise((pl.col("val") - pl.col("mean")) / pl.col("std"))
-                .alias("val")
-            ])
-            .select(["row", "col", "val"])
-        )
+    for offset, chunk in iter_parquet_chunks(input_path, chunk_size, columns=["row", "col", "val"]):
+        print(f"Processing rows {offset} -> {offset+chunk.height}")
 
-        table = chunk_std.to_arrow()
+        cols = chunk["col"].to_numpy()
+        val = ((chunk["val"].to_numpy().astype(np.float64) - mean[cols]) * inv_std[cols]).astype(np.float32)
 
-        if first_chunk:
-            pq.write_table(table, output_path)
-            first_chunk = False
-        else:
-            pq.write_table(table, output_path, append=True)
+        table = pa.table({
+            "row": pa.array(chunk["row"].to_numpy().astype(np.int32, copy=False)),
+            "col": pa.array(cols.astype(np.int32, copy=False)),
+            "val": pa.array(val),
+        }, schema=schema)
+        writer.write_table(table, row_group_size=row_group_size)
+        out_stats = merge_stats(out_stats, coo_chunk_stats(cols, val))
 
-        offset += chunk_size
+    writer.close()
+    if out_stats is not None:
+        save_stats(output_path, out_stats)
 
     print(f"Done. Standardized COO Parquet written to {output_path}")
 
@@ -111,6 +99,7 @@ if __name__ == "__main__":
     parser.add_argument("output_path", help="Output standardized COO Parquet file")
     parser.add_argument("-n", type=int, required=True, help="Total number of rows in the full matrix")
     parser.add_argument("--chunk", type=int, default=1_000_000, help="Chunk size for processing")
+    parser.add_argument("--row_group_size", type=int, default=None, help="Rows per output row group (default: chunk)")
     args = parser.parse_args()
 
-    standardize_coo_parquet(args.input_path, args.output_path, args.n, args.chunk)
+    standardize_coo_parquet(args.input_path, args.output_path, args.n, args.chunk, args.row_group_size)
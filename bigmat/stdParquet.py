@@ -1,46 +1,53 @@
-# python3 stdParquet.py input.parquet output.parquet --col_chunk 1000
+# python3 stdParquet.py input.parquet output.parquet --batch_rows 65536
 
-import polars as pl
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 import argparse
-import math
+import os
 
-def standardize_parquet(input_path, output_path, col_chunk=1000):
+from matmul import table_to_fortran
+from colStats import column_stats, mean_std, dense_block_stats, merge_stats, save_stats
+
+def standardize_parquet(input_path, output_path, col_chunk=None, *, batch_rows=65536):
     """
-    Standardize columns of a Parquet file to mean 0, std 1.
+    Standardize columns of a Parquet file to mean 0, std 1 (sample std).
+    Phase 1 computes mergeable per-column moments in one pass (or reuses
+    the colStats sidecar); phase 2 streams row batches through the
+    transform into a ParquetWriter and leaves a sidecar for the output, so
+    check_std needs no pass of its own. Columns with zero std become 0.
+    col_chunk is accepted for old callers and ignored (columns are no longer
+    processed in blocks).
     """
-    lf = pl.scan_parquet(input_path)
-    all_cols = lf.collect_schema().names()  # Avoid PerformanceWarning
-    standardized_chunks = []
-
-    print(f"Total columns: {len(all_cols)}")
-    
-    for i in range(0, len(all_cols), col_chunk):
-        chunk_cols = all_cols[i:i+col_chunk]
-        print(f"Processing columns {i} -> {i+len(chunk_cols)-1}")
-
-        # Compute mean and std for each column in chunk
-        agg_exprs = []
-        for c in chunk_cols:
-            agg_exprs.append(pl.col(c).mean().alias(f"{c}_mean"))
-            agg_exprs.append(pl.col(c).std().alias(f"{c}_std"))
-        stats = lf.select(agg_exprs).collect()[0]
-
-        # Generate standardized columns
-        standardized_exprs = []
-        for c in chunk_cols:
-            mean = stats[f"{c}_mean"].item()
-            std  = stats[f"{c}_std"].item()
-            if std is None or math.isclose(std, 0.0):
-                standardized_exprs.append(pl.lit(0.0).alias(c))
-            else:
-                standardized_exprs.append(((pl.col(c) - mean)/std).alias(c))
-
-        standardized_chunk = lf.select(standardized_exprs).collect()
-        standardized_chunks.append(standardized_chunk)
-
-    # Concatenate column blocks horizontally
-    result = pl.concat(standardized_chunks, how="horizontal")
-    result.write_parquet(output_path)
+    if col_chunk is not None:
+        print(f"Warning: col_chunk={col_chunk} is deprecated and ignored; rows are streamed in "
+              f"batches of batch_rows={batch_rows}")
+    pf = pq.ParquetFile(input_path)
+    schema = pf.schema_arrow
+    print(f"Total columns: {len(schema.names)}, rows: {pf.metadata.num_rows}")
+
+    print("Phase 1: column moments")
+    mean, std = mean_std(column_stats(input_path, batch_rows=batch_rows), ddof=1)
+    std = np.nan_to_num(std)
+    zero = np.isclose(std, 0.0)
+    inv_std = np.where(zero, 0.0, 1.0 / np.where(zero, 1.0, std))
+
+    print("Phase 2: transform")
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    writer = pq.ParquetWriter(output_path, schema)
+    done = 0
+    out_stats = None
+    for batch in pf.iter_batches(batch_size=batch_rows):
+        X = table_to_fortran(pa.Table.from_batches([batch]))
+        Z = ((X - mean) * inv_std).astype(X.dtype, order="F")
+        writer.write_table(pa.Table.from_arrays([pa.array(Z[:, j]) for j in range(Z.shape[1])], schema=schema))
+        out_stats = merge_stats(out_stats, dense_block_stats(Z))
+        done += batch.num_rows
+        print(f"  Rows {done - batch.num_rows} -> {done}")
+    writer.close()
+    if out_stats is not None:
+        save_stats(output_path, out_stats)
     print(f"Standardized Parquet saved to: {output_path}")
 
 
@@ -48,7 +55,8 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Standardize columns of a Parquet file")
     parser.add_argument("input", help="Input Parquet file path")
     parser.add_argument("output", help="Output Parquet file path")
-    parser.add_argument("--col_chunk", type=int, default=1000, help="Number of columns per block")
+    parser.add_argument("--batch_rows", type=int, default=65536, help="Rows per streamed batch")
+    parser.add_argument("--col_chunk", type=int, default=None, help="Deprecated, ignored (use --batch_rows)")
     args = parser.parse_args()
 
-    standardize_parquet(args.input, args.output, args.col_chunk)
+    standardize_parquet(args.input, args.output, args.col_chunk, batch_rows=args.batch_rows)
@@ -5,9 +5,12 @@ import pyarrow.parquet as pq
 import argparse
 import os
 
-def transpose_coo_parquet_chunked(input_parquet, output_parquet, chunk_size=1_000_000):
+from parquetChunks import iter_parquet_chunks
+
+def transpose_coo_parquet_chunked(input_parquet, output_parquet, chunk_size=1_000_000, row_group_size=None):
     """
     Transpose a COO Parquet safely in chunks to avoid memory overflow.
+    row_group_size sets the output row-group size (default: one per chunk).
     """
     print(f"Transposing {input_parquet} → {output_parquet}")
     if os.path.exists(output_parquet):
@@ -18,14 +21,10 @@ def transpose_coo_parquet_chunked(input_parquet, output_parquet, chunk_size=1_00
     total_rows = meta.num_rows
     print(f"Total rows: {total_rows}, chunk_size: {chunk_size}")
 
-    offset = 0
-    first_chunk = True
-
-    while offset < total_rows:
-        print(f"Processing rows {offset} -> {min(offset + chunk_size, total_rows)}")
+    writer = None
 
-        # slice chunk and collect
-        chunk = pl.scan_parquet(input_parquet).slice(offset, chunk_size).collect()
+    for offset, chunk in iter_parquet_chunks(input_parquet, chunk_size, columns=["row", "col", "val"]):
+        print(f"Processing rows {offset} -> {offset + chunk.height}")
 
         # swap row/col
         chunk = chunk.select([
@@ -37,14 +36,13 @@ def transpose_coo_parquet_chunked(input_parquet, output_parquet, chunk_size=1_00
         # convert to Arrow Table
         table = chunk.to_arrow()
 
-        # write/append to Parquet
-        if first_chunk:
-            pq.write_table(table, output_parquet)
-            first_chunk = False
-        else:
-            pq.write_table(table, output_parquet, append=True)
+        # write to Parquet
+        if writer is None:
+            writer = pq.ParquetWriter(output_parquet, table.schema)
+        writer.write_table(table, row_group_size=row_group_size)
 
-        offset += chunk_size
+    if writer is not None:
+        writer.close()
 
     print("Transpose completed.")
 
@@ -56,6 +54,7 @@ if __name__ == "__main__":
     parser.add_argument("input_parquet", help="Input COO Parquet path")
     parser.add_argument("output_parquet", help="Output transposed Parquet path")
     parser.add_argument("--chunk_size", type=int, default=1_000_000, help="Rows per chunk")
+    parser.add_argument("--row_group_size", type=int, default=None, help="Rows per output row group (default: chunk)")
     args = parser.parse_args()
 
-    transpose_coo_parquet_chunked(args.input_parquet, args.output_parquet, args.chunk_size)
+    transpose_coo_parquet_chunked(args.input_parquet, args.output_parquet, args.chunk_size, args.row_group_size)
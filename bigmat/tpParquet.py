@@ -1,47 +1,59 @@
+# python3 tpParquet.py A.parquet At.parquet --mem_mb 4096
+
+import numpy as np
 import pyarrow as pa
 import pyarrow.parquet as pq
-import polars as pl
 import os
 import argparse
 
-def transpose_parquet_blockwise(input_path, output_path, block_cols=1000):
-    # Read full table to get row/col counts
-    table = pq.read_table(input_path)
-    total_rows = table.num_rows
-    total_cols = table.num_columns
-    col_names = table.column_names
-    if not col_names:
-        col_names = [f"col{i}" for i in range(total_cols)]
+from matmul import table_to_fortran
+
+def transpose_parquet_blockwise(input_path, output_path, block_cols=None, mem_budget=4 << 30):
+    """
+    Transpose a dense Parquet matrix out of core.
+    Input column block [c0, c1) becomes output row group [c0, c1): it is read
+    as row-group x column-block tiles (only those column chunks, so every
+    byte of the input is read exactly once over the whole run), each tile is
+    transposed into a Fortran-ordered (c1-c0) x n_rows buffer, and the buffer
+    columns are handed to Arrow without copying.
+    block_cols defaults to what fits in mem_budget (buffer + encoding).
+    """
+    pf = pq.ParquetFile(input_path)
+    total_rows = pf.metadata.num_rows
+    col_names = pf.schema_arrow.names
+    total_cols = len(col_names)
+    dtype = pf.schema_arrow.field(0).type.to_pandas_dtype() if total_cols else np.float32
+    itemsize = np.dtype(dtype).itemsize
+
+    if block_cols is None:
+        block_cols = max(1, min(total_cols, mem_budget // (2 * itemsize * max(total_rows, 1))))
 
     if os.path.exists(output_path):
         os.remove(output_path)
 
-    print(f"Transposing {input_path} ({total_rows}x{total_cols}) in blocks of {block_cols} columns")
+    print(f"Transposing {input_path} ({total_rows}x{total_cols}) in blocks of {block_cols} columns "
+          f"({pf.metadata.num_row_groups} row groups per block)")
 
-    # Create ParquetWriter for output
-    writer = None
+    out_names = [f"col{i}" for i in range(total_rows)]
+    schema = pa.schema([(n, pa.from_numpy_dtype(dtype)) for n in out_names])
+    writer = pq.ParquetWriter(output_path, schema)
 
     for start_col in range(0, total_cols, block_cols):
         end_col = min(total_cols, start_col + block_cols)
         cols = col_names[start_col:end_col]
 
-        # Load block with Polars
-        df_block = pl.read_parquet(input_path).select(cols)
-
-        # Transpose block
-        dfT = df_block.transpose(include_header=False)
-
-        # Convert Polars -> PyArrow Table
-        tableT = pa.Table.from_arrays([dfT[col].to_numpy() for col in dfT.columns],
-                                      names=[f"col{i}" for i in range(dfT.width)])
-
-        # Initialize writer
-        if writer is None:
-            writer = pq.ParquetWriter(output_path, tableT.schema)
-        
-        # Write block
-        writer.write_table(tableT)
+        # Output row block: column r holds input row r, contiguous
+        out = np.empty((end_col - start_col, total_rows), dtype=dtype, order="F")
+        r0 = 0
+        for g in range(pf.metadata.num_row_groups):
+            tile = table_to_fortran(pf.read_row_group(g, columns=cols))
+            out[:, r0:r0 + tile.shape[0]] = tile.T
+            r0 += tile.shape[0]
 
+        writer.write_table(
+            pa.Table.from_arrays([pa.array(out[:, r]) for r in range(total_rows)], schema=schema),
+            row_group_size=end_col - start_col,
+        )
         print(f"Processed columns {start_col}-{end_col}")
 
     writer.close()
@@ -51,7 +63,11 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Transpose a Parquet numeric matrix.")
     parser.add_argument("input", type=str, help="Input Parquet file path")
     parser.add_argument("output", type=str, help="Output Parquet file path")
+    parser.add_argument("--block_cols", type=int, default=None,
+                        help="Input columns per output row group (default: from --mem_mb)")
+    parser.add_argument("--mem_mb", type=int, default=4096, help="Memory budget for one output block (MB)")
 
     args = parser.parse_args()
 
-    transpose_parquet_blockwise(args.input, args.output)
+    transpose_parquet_blockwise(args.input, args.output, block_cols=args.block_cols,
+                                mem_budget=args.mem_mb * 1024 * 1024)
@@ -0,0 +1,190 @@
+# python3 verifyStd.py Astd.parquet --workers 8 --max_failures 20          (dense)
+# python3 verifyStd.py Astd_coo.parquet -n 2000 --workers 8 --processes    (COO, implicit zeros)
+
+import numpy as np
+import pyarrow.parquet as pq
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from colStats import (dense_block_stats, coo_chunk_stats, merge_stats, mean_std, is_coo,
+                      load_stats, save_stats, stats_path)
+from parquetChunks import dataset_files, parquet_chunk_plan, read_parquet_chunk
+
+
+def dense_block_task(path, columns):
+    """Statistics of one column block of a dense Parquet file over all its row groups."""
+    from matmul import table_to_fortran
+
+    pf = pq.ParquetFile(path)
+    stats = dense_block_stats(np.zeros((0, len(columns))))
+    for g in range(pf.metadata.num_row_groups):
+        stats = merge_stats(stats, dense_block_stats(table_to_fortran(pf.read_row_group(g, columns=columns))))
+    return stats
+
+
+def coo_chunk_task(path, row_groups):
+    """Statistics of the stored entries in some row groups of a COO Parquet file."""
+    chunk = read_parquet_chunk(path, row_groups, columns=["col", "val"])
+    return coo_chunk_stats(chunk["col"].to_numpy(), chunk["val"].to_numpy())
+
+
+def find_violators(stats, tol=1e-6, total_rows=None, ddof=1, names=None, col_offset=0):
+    """
+    Columns whose mean is not 0 or std is not 1 within tol, or that contain NaN.
+    Returns a list of (name, mean, std, min, max, nan). Columns with no
+    values are skipped.
+    """
+    mean, std = mean_std(stats, total_rows, ddof)
+    nan = stats.get("nan", np.zeros_like(stats["count"]))
+    bad = (stats["count"] > 0) & (
+        (np.abs(mean) > tol) | (np.abs(std - 1.0) > tol) | np.isnan(std) | (nan > 0)
+    )
+    out = []
+    for j in np.flatnonzero(bad):
+        name = names[j] if names is not None else f"col{col_offset + j}"
+        out.append((name, float(mean[j]), float(std[j]), float(stats["min"][j]), float(stats["max"][j]), int(nan[j])))
+    return out
+
+
+def concat_stats(blocks):
+    """Stitch statistics of consecutive column blocks into one set."""
+    return {"kind": blocks[0]["kind"]} | {
+        k: np.concatenate([b[k] for b in blocks]) for k in blocks[0] if k != "kind"
+    }
+
+
+def make_pool(workers, processes):
+    if processes:
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+def verify_dense(path, tol=1e-6, workers=4, block_cols=256, max_failures=None, processes=False):
+    """
+    Verify every column of a standardized dense Parquet file or part-file
+    dataset (mean 0, sample std 1, no NaN) in one pass. (part, column block)
+    tasks are fanned out to a pool; each reads only its column chunks, so
+    the data is read once in total. A column block is checked once all
+    parts have reported, and the run stops once max_failures violators are
+    found. Every fully read part gets a colStats sidecar; parts with a valid
+    sidecar are not read. Returns the list of violators.
+    """
+    parts = dataset_files(path)
+    names = pq.read_schema(parts[0]).names
+    starts = list(range(0, len(names), block_cols))
+
+    cached = {}
+    for part in parts:
+        s = load_stats(part)
+        if s is not None and "nan" in s:
+            print(f"Using cached statistics: {stats_path(part)}")
+            cached[part] = s
+    todo = [p for p in parts if p not in cached]
+    base = None
+    for part in parts:
+        if part in cached:
+            base = merge_stats(base, cached[part])
+
+    if not todo:
+        return find_violators(base, tol, names=names)[:max_failures]
+
+    print(f"Verifying {path}: {len(todo)} parts x {len(names)} columns in {len(starts)} blocks, {workers} workers")
+    violators = []
+    blocks = {(p, s): None for p in todo for s in starts}
+    pending = {s: len(todo) for s in starts}
+    merged = {s: None for s in starts}
+    pool = make_pool(workers, processes)
+    try:
+        futures = {pool.submit(dense_block_task, p, names[s:s + block_cols]): (p, s) for p, s in blocks}
+        for f in as_completed(futures):
+            p, s = futures[f]
+            blocks[p, s] = f.result()
+            merged[s] = merge_stats(merged[s], blocks[p, s])
+            pending[s] -= 1
+            if pending[s]:
+                continue
+            if base is not None:
+                merged[s] = merge_stats(merged[s], {k: (v if k == "kind" else v[s:s + block_cols])
+                                                    for k, v in base.items()})
+            violators.extend(find_violators(merged[s], tol, names=names[s:s + block_cols]))
+            if max_failures and len(violators) >= max_failures:
+                print(f"Stopping early: {len(violators)} failing columns found")
+                break
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    for p in todo:
+        if all(blocks[p, s] is not None for s in starts):
+            save_stats(p, concat_stats([blocks[p, s] for s in starts]))
+    return violators[:max_failures]
+
+
+def verify_coo(path, total_rows, tol=1e-6, workers=4, chunk_size=1_000_000, max_failures=None, processes=False):
+    """
+    Verify every column of a standardized COO Parquet file (mean 0,
+    population std 1 with implicit zeros, no NaN) in one pass. Row-group
+    chunks are fanned out to a pool and the partial per-column sums are
+    merged. Mean/std are only final after the whole file, so the early exit
+    triggers on NaN columns. A complete pass leaves a colStats sidecar.
+    Returns the list of violators.
+    """
+    cached = load_stats(path)
+    if cached is not None and "nan" in cached:
+        print(f"Using cached statistics: {stats_path(path)}")
+        return find_violators(cached, tol, total_rows, ddof=0)[:max_failures]
+
+    plan = parquet_chunk_plan(path, chunk_size)
+    print(f"Verifying {path}: {len(plan)} chunks, {workers} workers")
+    stats, done = None, 0
+    pool = make_pool(workers, processes)
+    try:
+        futures = [pool.submit(coo_chunk_task, path, groups) for _, _, groups in plan]
+        for f in as_completed(futures):
+            stats = merge_stats(stats, f.result())
+            done += 1
+            if max_failures and int((stats["nan"] > 0).sum()) >= max_failures:
+                print(f"Stopping early: NaN in {int((stats['nan'] > 0).sum())} columns")
+                break
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    if stats is None:
+        return []
+    if done == len(plan):
+        save_stats(path, stats)
+    violators = find_violators(stats, tol, total_rows, ddof=0)
+    return violators[:max_failures]
+
+
+def print_violators(violators):
+    for name, mean, std, lo, hi, nan in violators:
+        extra = f", nan={nan}" if nan else ""
+        print(f"Column '{name}': mean={mean:.6f}, std={std:.6f}, min={lo:.6g}, max={hi:.6g}{extra}")
+    print(f"{len(violators)} failing columns" if violators else "All columns OK")
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="One-pass parallel check of a standardized dense or COO Parquet file")
+    parser.add_argument("parquet", help="Standardized Parquet file (dense or COO) or dense part-file dataset")
+    parser.add_argument("-n", type=int, default=None, help="Total rows of the full matrix (required for COO)")
+    parser.add_argument("--tol", type=float, default=1e-6, help="Tolerance for mean/std check")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel tasks")
+    parser.add_argument("--processes", action="store_true", help="Use processes instead of threads")
+    parser.add_argument("--max_failures", type=int, default=None, help="Stop after this many failing columns")
+    parser.add_argument("--block_cols", type=int, default=256, help="Columns per task (dense)")
+    parser.add_argument("--chunk", type=int, default=1_000_000, help="Rows per task (COO)")
+    args = parser.parse_args()
+
+    if is_coo(dataset_files(args.parquet)[0]):
+        if args.n is None:
+            parser.error("-n is required for COO input")
+        v = verify_coo(args.parquet, args.n, tol=args.tol, workers=args.workers, chunk_size=args.chunk,
+                       max_failures=args.max_failures, processes=args.processes)
+    else:
+        v = verify_dense(args.parquet, tol=args.tol, workers=args.workers, block_cols=args.block_cols,
+                         max_failures=args.max_failures, processes=args.processes)
+    print_violators(v)